@@ -0,0 +1,402 @@
+import json
+import os
+import time
+from collections import deque
+from enum import Enum, unique
+
+from checkpoint import Checkpoint, hash_datas
+from compiled_template import template_cache, Compression
+from data_loader import DataLoader
+from doc_processor import DocumentProcessor
+from instrumentation import Instrumentation, BufferSink, optional_timer
+from output_sink import OutputSink, FileSink, MemorySink
+from result_cache import ResultCache
+from template_analyzer import TemplateAnalyzer, RenderContext
+
+
+@unique
+class RenderCode(Enum):
+    SUCCESS = 1
+    # 已生成且数据与模板未变化，跳过
+    SKIPPED = 2
+    # 从生成结果缓存中获取
+    CACHED = 3
+    # 生成失败
+    RENDER_ERROR = -1
+
+    def __str__(self):
+        return f'{super(RenderCode, self).__str__()} {self.value}'
+
+    def is_error(self):
+        return self.value < 0
+
+
+class RenderOptions:
+    """批量生成选项，需要可被 pickle 以传递给工作进程"""
+
+    def __init__(self, copy_unchanged: bool = True, deterministic: bool = False, now: float = None,
+                 result_cache_dir: str = None, compression: Compression = Compression.DEFAULT, image_dpi: int = None):
+        """
+        :param copy_unchanged: 保存时原样拷贝模板中未修改的部件，见 CompiledTemplate.save
+        :param deterministic: 确定性输出，见 CompiledTemplate.save，未指定 now 时整个批次使用批次开始时的时间
+        :param now: 固定的当前时间戳，日期、时间等静态数据都使用该时间，默认使用系统时间
+        :param result_cache_dir: 生成结果缓存目录，见 ResultCache，通常与 deterministic 一起使用
+        :param compression: 保存时的压缩方式，见 Compression，可以用输出文件大小换取生成速度
+        :param image_dpi: 图片目标分辨率，见 RenderContext，同一尺寸的缩小结果在每个进程内只生成一次
+        """
+        self.copy_unchanged = copy_unchanged
+        self.deterministic = deterministic
+        self.now = now
+        self.result_cache_dir = result_cache_dir
+        self.compression = compression
+        self.image_dpi = image_dpi
+
+    def resolve(self) -> 'RenderOptions':
+        """确定性输出且未指定时间时，固定使用当前时间"""
+        if self.deterministic and self.now is None:
+            return RenderOptions(self.copy_unchanged, self.deterministic, time.time(), self.result_cache_dir,
+                                 self.compression, self.image_dpi)
+        return self
+
+    def make_context(self, instrumentation: Instrumentation = None) -> RenderContext:
+        now = self.now
+        return RenderContext(clock=None if now is None else lambda: now, instrumentation=instrumentation,
+                             image_dpi=self.image_dpi)
+
+    def fingerprint(self) -> str:
+        """影响生成文件内容的保存与图片选项，断点清单只跳过以相同选项生成的数据"""
+        return f'{self.copy_unchanged}:{self.deterministic}:{self.compression.name}:{self.image_dpi}'
+
+    def make_result_cache(self) -> [ResultCache, None]:
+        return ResultCache(self.result_cache_dir) if self.result_cache_dir else None
+
+
+def make_save_path(save_pattern: str, index: int, datas: dict, shard: int = 0) -> str:
+    """
+    根据命名模式生成输出路径
+
+    :param save_pattern: 命名模式，使用 str.format 语法，可引用 {index} 为数据序号（从 0 开始），{shard} 为数据加载器的分片序号，
+                         也可引用数据字典中的字段，例如 'out/{index}_{name}.docx'。分片运行时序号在每个分片内从 0 开始，需要同时引用 {shard} 或唯一的数据字段
+    :param index: 数据序号
+    :param datas: 插入内容字典
+    :param shard: 分片序号
+    """
+    return save_pattern.format_map({**datas, 'index': index, 'shard': shard})
+
+
+def _iter_records(data_loader: DataLoader):
+    """依次加载数据直到返回 None，生成 (序号, 数据) 二元组"""
+    index = 0
+    while (datas := data_loader.load_data()) is not None:
+        yield index, datas
+        index += 1
+
+
+def _iter_chunks(records, chunk_size: int):
+    """按 chunk_size 将 (序号, 数据) 二元组分块，生成 [(序号, 数据), ...] 列表"""
+    chunk = []
+    for record in records:
+        chunk.append(record)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _render_record(template, index: int, datas: dict, save_pattern: str, context: RenderContext, shard: int = 0,
+                   options: RenderOptions = None, result_cache: ResultCache = None, sink: OutputSink = None) -> dict:
+    """生成单组数据的文档写入输出目标并返回生成结果，异常不会向外抛出"""
+    if options is None:
+        options = RenderOptions()
+    if sink is None:
+        sink = FileSink()
+    instrumentation = context.instrumentation
+    if instrumentation is not None:
+        instrumentation.index = index
+        instrumentation.begin()
+    start = time.perf_counter()
+    save_path = None
+    try:
+        save_path = make_save_path(save_pattern, index, datas, shard)
+        # 每组数据生成前重新注册静态数据（当前日期与时间等）
+        context.register_static_datas()
+        cache_key = cache_path = None
+        if result_cache is not None:
+            cache_key = ResultCache.make_key(template, datas, context.static_datas, options.copy_unchanged,
+                                             options.deterministic, options.compression)
+            if cache_key is not None:
+                cache_path = result_cache.lookup(cache_key)
+        if cache_path is not None:
+            size = sink.write_file(save_path, cache_path)
+            result = {'code': RenderCode.CACHED, 'msg': 'cached', 'no_data_points': [], 'save_time': 0.0, 'size': size}
+        else:
+            document, no_data_points = DocumentProcessor.render_document(template, datas, context)
+
+            def save(file):
+                template.save(document, file, options.copy_unchanged, options.deterministic, options.compression)
+
+            save_start = time.perf_counter()
+            with optional_timer(instrumentation, 'save') as save_fields:
+                if cache_key is not None:
+                    # 先保存到缓存，再链接或拷贝到输出目标
+                    size = sink.write_file(save_path, result_cache.save(cache_key, save))
+                else:
+                    size = sink.write(save_path, save)
+                save_fields['size'] = size
+            save_time = time.perf_counter() - save_start
+            result = {'code': RenderCode.SUCCESS, 'msg': 'successful', 'no_data_points': list(no_data_points),
+                      'save_time': save_time, 'size': size}
+    except Exception as e:
+        result = {'code': RenderCode.RENDER_ERROR, 'msg': f'{type(e).__name__}: {e}', 'no_data_points': [],
+                  'save_time': 0.0, 'size': None}
+    result.update({'index': index, 'save_path': save_path, 'time': time.perf_counter() - start})
+    if instrumentation is not None:
+        instrumentation.end('document', code=result['code'].name)
+        instrumentation.index = None
+    return result
+
+
+def _iter_pending_records(template, data_loader: DataLoader, save_pattern: str, checkpoint: Checkpoint, skipped: list,
+                          pending: dict):
+    """
+    过滤断点清单中已完成的数据，生成需要生成的 (序号, 数据) 二元组
+
+    :param skipped: 被跳过数据的结果列表，跳过时追加
+    :param pending: 需要生成的数据序号到 (记录键, 数据哈希) 的字典，生成后需要写入断点清单
+    """
+    shard = data_loader.shard_index
+    for index, datas in _iter_records(data_loader):
+        if checkpoint is None:
+            yield index, datas
+            continue
+        record_key, data_hash = checkpoint.record_key(index, datas, shard), hash_datas(datas, template.get_data_files(datas))
+        try:
+            save_path = make_save_path(save_pattern, index, datas, shard)
+        except Exception:
+            # 命名模式错误由生成过程报告
+            save_path = None
+        if save_path is not None and checkpoint.is_done(record_key, data_hash, save_path):
+            skipped.append({'index': index, 'save_path': save_path, 'code': RenderCode.SKIPPED, 'msg': 'skipped',
+                            'no_data_points': [], 'time': 0.0, 'save_time': 0.0, 'size': None})
+            continue
+        pending[index] = (record_key, data_hash)
+        yield index, datas
+
+
+def _append_checkpoint(checkpoint: Checkpoint, pending: dict, result: dict):
+    if checkpoint is not None:
+        record_key, data_hash = pending.pop(result['index'])
+        checkpoint.append(record_key, data_hash, result['save_path'], result['code'].name)
+
+
+def _check_sink(sink: OutputSink, checkpoint_path: str):
+    if checkpoint_path and sink is not None and not isinstance(sink, FileSink):
+        raise ValueError('断点清单只支持输出到文件（FileSink）')
+
+
+def render_batch(file_path: str, data_loader: DataLoader, save_pattern: str, context: RenderContext = None,
+                 checkpoint_path: str = None, checkpoint_key: str = None, options: RenderOptions = None,
+                 sink: OutputSink = None, instrumentation: Instrumentation = None) -> list[dict]:
+    """
+    批量生成文档，依次加载 data_loader 中的每组数据直到返回 None，模板在整个批次中只加载一次
+
+    :param file_path: 模板文件路径
+    :param data_loader: 数据加载器
+    :param save_pattern: 输出路径命名模式，见 make_save_path
+    :param context: 渲染上下文，默认根据 options 新建，多线程同时批量生成时每个线程需使用独立的上下文
+    :param checkpoint_path: 断点清单路径，指定时跳过已生成且模板与数据都未变化的数据，并记录每组数据的生成结果，见 Checkpoint
+    :param checkpoint_key: 断点清单的记录键字段，见 Checkpoint
+    :param options: 生成选项，见 RenderOptions
+    :param sink: 输出目标，见 output_sink，默认每个文档写入 save_pattern 生成的文件路径，否则 save_pattern 生成的是文档在输出目标中的名称。
+                 输出目标由调用方关闭；只有输出到文件时支持断点清单
+    :param instrumentation: 计时埋点，见 instrumentation，记录模板编译、每个标签、保存与每份文档的耗时，指定时替换 context 中的计时埋点
+
+    :return: 模板校验失败时打印校验信息并返回空列表；否则返回每组数据的生成结果列表，元素为字典，包含 index:数据序号、save_path:输出路径（文档名称）、code:RenderCode、msg:信息、no_data_points:没有对应数据的插入点名称列表、time:耗时（秒）、save_time:保存耗时（秒）、size:写入的字节数
+    """
+    _check_sink(sink, checkpoint_path)
+    if instrumentation is None and context is not None:
+        instrumentation = context.instrumentation
+    check_result = template_cache.get(file_path, instrumentation)
+    if check_result['code'].is_error():
+        TemplateAnalyzer.print_check_info(check_result)
+        return []
+    template = check_result['data']['template']
+    options = (options or RenderOptions()).resolve()
+    if context is None:
+        context = options.make_context(instrumentation)
+    else:
+        context.instrumentation = instrumentation
+    result_cache = options.make_result_cache()
+
+    results, pending = [], {}
+    checkpoint = (Checkpoint(checkpoint_path, template.template_hash, checkpoint_key, options.fingerprint())
+                  if checkpoint_path else None)
+    try:
+        for index, datas in _iter_pending_records(template, data_loader, save_pattern, checkpoint, results, pending):
+            result = _render_record(template, index, datas, save_pattern, context, data_loader.shard_index,
+                                    options, result_cache, sink)
+            _append_checkpoint(checkpoint, pending, result)
+            results.append(result)
+    finally:
+        if checkpoint is not None:
+            checkpoint.close()
+    results.sort(key=lambda r: r['index'])
+    return results
+
+
+# 工作进程内预加载的模板、渲染上下文、生成选项与生成结果缓存
+_worker_template = None
+_worker_context = None
+_worker_options = None
+_worker_result_cache = None
+
+
+def _init_worker(file_path: str, options: RenderOptions, instrumented: bool = False, memory: bool = False):
+    """
+    工作进程初始化，加载并编译模板。fork 启动时直接复用父进程已编译的模板缓存（写时复制）
+
+    :param instrumented: 是否计时，计时事件缓存在工作进程中，随每块的生成结果返回主进程
+    :param memory: 是否统计内存，见 Instrumentation
+    """
+    global _worker_template, _worker_context, _worker_options, _worker_result_cache
+    _worker_template = template_cache.get(file_path)['data']['template']
+    _worker_context = options.make_context(Instrumentation(BufferSink(), memory=memory) if instrumented else None)
+    _worker_options = options
+    _worker_result_cache = options.make_result_cache()
+
+
+def _render_chunk(chunk: list, save_pattern: str, shard: int, in_memory: bool = False) -> tuple[list[dict], list[dict]]:
+    """
+    生成一块数据，in_memory 为 True 时文档内容放在结果的 data 字段中返回主进程，由主进程写入输出目标
+
+    :return: (生成结果列表, 计时事件列表) 二元组
+    """
+    sink = MemorySink() if in_memory else None
+    results = [_render_record(_worker_template, index, datas, save_pattern, _worker_context, shard,
+                              _worker_options, _worker_result_cache, sink) for index, datas in chunk]
+    if in_memory:
+        for result in results:
+            result['data'] = sink.results.pop(result['save_path'], None)
+    events = []
+    if _worker_context.instrumentation is not None:
+        buffer = _worker_context.instrumentation.sinks[0]
+        events, buffer.events = buffer.events, []
+    return results, events
+
+
+def render_batch_parallel(file_path: str, data_loader: DataLoader, save_pattern: str,
+                          workers: int = None, chunk_size: int = 16, max_in_flight: int = None,
+                          checkpoint_path: str = None, checkpoint_key: str = None,
+                          options: RenderOptions = None, sink: OutputSink = None,
+                          instrumentation: Instrumentation = None) -> list[dict]:
+    """
+    使用进程池并行批量生成文档，每个工作进程只加载一次模板，数据按块分发，结果按数据顺序返回
+
+    输出到文件以外的输出目标时，工作进程在内存中生成文档并传回主进程，由主进程按完成顺序写入，
+    主进程同时持有的文档数不超过 max_in_flight * chunk_size
+
+    :param file_path: 模板文件路径
+    :param data_loader: 数据加载器，在主进程中加载，数据需要可被 pickle
+    :param save_pattern: 输出路径命名模式，见 make_save_path
+    :param workers: 工作进程数，默认为 CPU 核数
+    :param chunk_size: 每次分发给工作进程的数据组数
+    :param max_in_flight: 同时提交且未完成的最大块数，用于限制主进程预读的数据量，默认为工作进程数的 2 倍
+    :param checkpoint_path: 断点清单路径，由主进程读取与写入，见 render_batch
+    :param checkpoint_key: 断点清单的记录键字段，见 Checkpoint
+    :param options: 生成选项，见 RenderOptions
+    :param sink: 输出目标，见 render_batch
+    :param instrumentation: 计时埋点，见 render_batch，工作进程中产生的事件随生成结果返回，由主进程分发
+
+    :return: 与 render_batch 相同
+    """
+    _check_sink(sink, checkpoint_path)
+    in_memory = sink is not None and not isinstance(sink, FileSink)
+    # 在主进程中先校验模板，fork 启动的工作进程会继承编译结果
+    check_result = template_cache.get(file_path, instrumentation)
+    if check_result['code'].is_error():
+        TemplateAnalyzer.print_check_info(check_result)
+        return []
+
+    options = (options or RenderOptions()).resolve()
+    workers = workers or os.cpu_count() or 1
+    max_in_flight = max_in_flight or workers * 2
+
+    template = check_result['data']['template']
+    results, pending = [], {}
+    checkpoint = (Checkpoint(checkpoint_path, template.template_hash, checkpoint_key, options.fingerprint())
+                  if checkpoint_path else None)
+
+    def collect(chunk_results: tuple[list[dict], list[dict]]):
+        chunk_results, events = chunk_results
+        for event in events:
+            instrumentation.forward(event)
+        for result in chunk_results:
+            if in_memory:
+                data = result.pop('data')
+                if data is not None:
+                    result['size'] = sink.write_bytes(result['save_path'], data)
+            _append_checkpoint(checkpoint, pending, result)
+            results.append(result)
+
+    try:
+        # 进程池模块导入较慢，只在并行生成时导入
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(file_path, options, instrumentation is not None,
+                                           instrumentation is not None and instrumentation.memory)) as executor:
+            in_flight = deque()
+            records = _iter_pending_records(template, data_loader, save_pattern, checkpoint, results, pending)
+            for chunk in _iter_chunks(records, chunk_size):
+                if len(in_flight) >= max_in_flight:
+                    collect(in_flight.popleft().result())
+                in_flight.append(executor.submit(_render_chunk, chunk, save_pattern, data_loader.shard_index,
+                                                 in_memory))
+            while in_flight:
+                collect(in_flight.popleft().result())
+    finally:
+        if checkpoint is not None:
+            checkpoint.close()
+    results.sort(key=lambda r: r['index'])
+    return results
+
+
+def write_manifest(manifest_path: str, results: list[dict], data_loader: DataLoader = None):
+    """
+    将批量生成结果写入清单文件（JSON Lines），每行为一组数据的生成结果，分片运行时每个分片写入自己的清单
+
+    :param manifest_path: 清单文件路径
+    :param results: render_batch 或 render_batch_parallel 返回的结果列表
+    :param data_loader: 数据加载器，用于记录分片信息
+    """
+    shard_index, shard_count = (data_loader.shard_index, data_loader.shard_count) if data_loader is not None else (0, 1)
+    with open(manifest_path, 'w', encoding='utf-8') as f:
+        for r in results:
+            f.write(json.dumps({'shard_index': shard_index, 'shard_count': shard_count, 'index': r['index'],
+                                'save_path': r['save_path'], 'status': r['code'].name, 'msg': r['msg'],
+                                'time': r['time'], 'save_time': r['save_time'], 'size': r['size']},
+                               ensure_ascii=False) + '\n')
+
+
+def print_batch_info(results: list[dict], show_detail=False):
+    """
+    打印批量生成结果
+
+    :param results: render_batch 返回的结果列表
+    :param show_detail: 打印每组数据的详细信息
+    """
+    success_count = sum(1 for r in results if r['code'] == RenderCode.SUCCESS)
+    skipped_count = sum(1 for r in results if r['code'] == RenderCode.SKIPPED)
+    cached_count = sum(1 for r in results if r['code'] == RenderCode.CACHED)
+    error_count = len(results) - success_count - skipped_count - cached_count
+    total_time = sum(r['time'] for r in results)
+    total_save_time = sum(r['save_time'] for r in results)
+    total_size = sum(r['size'] or 0 for r in results)
+    print(f"批量生成完成，共 {len(results)} 组数据，成功 {success_count} 组，跳过 {skipped_count} 组，使用缓存 {cached_count} 组，"
+          f"失败 {error_count} 组，总耗时 {total_time:.3f} 秒，保存耗时 {total_save_time:.3f} 秒，写入 {total_size} 字节")
+    for r in results:
+        if r['code'].is_error():
+            print(f"\t({r['index']}) 生成失败\n\t\t错误代码：{r['code']}\n\t\t错误信息：{r['msg']}")
+        elif show_detail and r['code'] == RenderCode.SUCCESS:
+            print(f"\t({r['index']}) {r['save_path']}，耗时 {r['time']:.3f} 秒，保存耗时 {r['save_time']:.3f} 秒，"
+                  f"大小 {r['size']} 字节，无数据的内容标签：{r['no_data_points']}")
@@ -0,0 +1,105 @@
+import random
+import struct
+import zlib
+
+from docx import Document
+
+
+class BenchmarkConfig:
+    """合成模板与数据的规模配置"""
+
+    def __init__(self, text_labels: int = 20, list_labels: int = 2, list_length: int = 20,
+                 table_labels: int = 1, table_rows: int = 100, table_columns: int = 6,
+                 image_labels: int = 2, image_width: int = 800, image_height: int = 600,
+                 link_labels: int = 10, records: int = 20, seed: int = 0):
+        """
+        :param text_labels: 文本标签数
+        :param list_labels: 有序列表与无序列表标签各自的数量
+        :param list_length: 每个列表的项数
+        :param table_labels: 表格标签数
+        :param table_rows: 每个表格的行数（含表头）
+        :param table_columns: 每个表格的列数
+        :param image_labels: 图片标签数
+        :param image_width: 合成图片的宽度（像素）
+        :param image_height: 合成图片的高度（像素）
+        :param link_labels: 链接标签数
+        :param records: 数据组数
+        :param seed: 随机数种子，相同配置生成的数据相同
+        """
+        self.text_labels = text_labels
+        self.list_labels = list_labels
+        self.list_length = list_length
+        self.table_labels = table_labels
+        self.table_rows = table_rows
+        self.table_columns = table_columns
+        self.image_labels = image_labels
+        self.image_width = image_width
+        self.image_height = image_height
+        self.link_labels = link_labels
+        self.records = records
+        self.seed = seed
+
+    def to_dict(self) -> dict:
+        return dict(vars(self))
+
+
+def make_png(width: int, height: int) -> bytes:
+    """生成灰度渐变的 PNG 图片，不依赖图像处理库"""
+    row = bytes([0]) + bytes(x * 255 // max(width - 1, 1) for x in range(width))
+
+    def chunk(tag: bytes, data: bytes) -> bytes:
+        return struct.pack('>I', len(data)) + tag + data + struct.pack('>I', zlib.crc32(tag + data))
+
+    return (b'\x89PNG\r\n\x1a\n'
+            + chunk(b'IHDR', struct.pack('>2I5B', width, height, 8, 0, 0, 0, 0))
+            + chunk(b'IDAT', zlib.compress(row * height))
+            + chunk(b'IEND', b''))
+
+
+def generate_template(config: BenchmarkConfig, template_path: str):
+    """按配置生成包含各类内容标签的模板，标签名称为 类型缩写 + 序号，如 text0、ul0"""
+    document = Document()
+    document.add_heading('合成基准测试模板', 0)
+    document.add_paragraph('生成日期：{{date:}}，生成时间：{{time:}}')
+    for i in range(config.text_labels):
+        document.add_paragraph(f'第 {i} 段文本：{{{{text:text{i}}}}}')
+    for i in range(config.list_labels):
+        document.add_paragraph(f'{{{{unordered-list:ul{i}}}}}', style='List Bullet')
+        document.add_paragraph(f'{{{{ordered-list:ol{i}}}}}', style='List Number')
+    for i in range(config.table_labels):
+        document.add_paragraph(f'{{{{table:table{i}}}}}')
+    for i in range(config.image_labels):
+        document.add_paragraph(f'{{{{image:img{i}}}}}')
+    for i in range(config.link_labels):
+        document.add_paragraph(f'链接 {i}：{{{{link:link{i}}}}}')
+    document.save(template_path)
+
+
+def generate_image(config: BenchmarkConfig, image_path: str):
+    with open(image_path, 'wb') as f:
+        f.write(make_png(config.image_width, config.image_height))
+
+
+def generate_datas(config: BenchmarkConfig, image_path: str) -> list[dict]:
+    """按配置生成与 generate_template 模板对应的数据"""
+    rand = random.Random(config.seed)
+
+    def word(n: int = 8) -> str:
+        return ''.join(rand.choice('数据生成模板文档性能测试abcdefghijklmnopqrstuvwxyz') for _ in range(n))
+
+    datas = []
+    for record in range(config.records):
+        datas_item = {}
+        for i in range(config.text_labels):
+            datas_item[f'text{i}'] = word(rand.randint(10, 60))
+        for i in range(config.list_labels):
+            datas_item[f'ul{i}'] = [word() for _ in range(config.list_length)]
+            datas_item[f'ol{i}'] = [word() for _ in range(config.list_length)]
+        for i in range(config.table_labels):
+            datas_item[f'table{i}'] = [[word(4) for _ in range(config.table_columns)] for _ in range(config.table_rows)]
+        for i in range(config.image_labels):
+            datas_item[f'img{i}'] = (f'图片 {i}', image_path)
+        for i in range(config.link_labels):
+            datas_item[f'link{i}'] = (f'链接 {i}', f'https://example.com/{record}/{i}')
+        datas.append(datas_item)
+    return datas
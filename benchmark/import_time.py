@@ -0,0 +1,63 @@
+"""
+导入耗时检查：在新的解释器中多次导入模块（默认为 main），取最小耗时与预算比较，超出预算时返回非零退出码
+
+短时运行的命令行调用与新启动的工作进程都要付出导入开销，导入时不应做解析文档、导入可选依赖等额外工作。
+
+用法（在项目根目录执行）：
+    python -m benchmark.import_time
+    python -m benchmark.import_time --module batch_renderer --budget 0.12 --detail
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+# main 的默认导入耗时预算（秒），接近只导入 python-docx 与原有模块时的耗时，其中 python-docx 本身约占七成
+DEFAULT_BUDGET = 0.15
+
+_project_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def measure_import_time(module: str, repeat: int = 5) -> float:
+    """在新的解释器中导入模块 repeat 次，返回最小耗时（秒）"""
+    code = f'import time; t = time.perf_counter(); import {module}; print(time.perf_counter() - t)'
+    times = []
+    for _ in range(repeat):
+        output = subprocess.run([sys.executable, '-c', code], cwd=_project_dir, check=True,
+                                capture_output=True, text=True).stdout
+        times.append(float(output.strip().splitlines()[-1]))
+    return min(times)
+
+
+def print_import_detail(module: str, top: int = 15):
+    """打印累计导入耗时最多的模块（基于 python -X importtime）"""
+    stderr = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'], cwd=_project_dir,
+                            check=True, capture_output=True, text=True).stderr
+    rows = []
+    for line in stderr.splitlines():
+        parts = line.split('|')
+        if len(parts) == 3 and parts[1].strip().isdigit():
+            rows.append((int(parts[1]), parts[2].strip()))
+    for cumulative, name in sorted(rows, reverse=True)[:top]:
+        print(f'{cumulative / 1000:>10.1f}ms  {name}')
+
+
+def main(argv: list[str] = None) -> int:
+    parser = argparse.ArgumentParser(description='导入耗时检查')
+    parser.add_argument('--module', default='main', help='要导入的模块')
+    parser.add_argument('--budget', type=float, default=DEFAULT_BUDGET, help='导入耗时预算（秒）')
+    parser.add_argument('--repeat', type=int, default=5, help='导入次数，取最小耗时')
+    parser.add_argument('--detail', action='store_true', help='打印累计导入耗时最多的模块')
+    args = parser.parse_args(argv)
+
+    import_time = measure_import_time(args.module, args.repeat)
+    within_budget = import_time <= args.budget
+    print(f"导入 {args.module} 耗时 {import_time * 1000:.1f}ms，预算 {args.budget * 1000:.0f}ms，"
+          f"{'未超出预算' if within_budget else '超出预算'}")
+    if args.detail or not within_budget:
+        print_import_detail(args.module)
+    return 0 if within_budget else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,152 @@
+"""
+性能基准测试：生成合成模板与数据，分别测量模板校验、各类标签插入数据与保存的耗时，结果保存为 JSON 以便比较不同版本
+
+用法（在项目根目录执行）：
+    python -m benchmark.run --out result.json
+    python -m benchmark.run --table-rows 5000 --records 5 --out big_table.json --compare result.json
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+import docx
+
+from benchmark.generator import BenchmarkConfig, generate_template, generate_image, generate_datas
+from compiled_template import CompiledTemplate, Compression
+from instrumentation import summarize
+from template_analyzer import TemplateAnalyzer, RenderContext
+
+
+def _time(func) -> float:
+    start = time.perf_counter()
+    func()
+    return time.perf_counter() - start
+
+
+def run_benchmark(config: BenchmarkConfig, work_dir: str, repeat: int = 5) -> dict:
+    """
+    执行基准测试
+
+    :param config: 合成模板与数据的规模配置
+    :param work_dir: 存放合成模板与图片的目录
+    :param repeat: 模板校验与编译的重复次数
+
+    :return: 测试结果字典，耗时单位为秒，见 summarize
+    """
+    template_path = os.path.join(work_dir, 'template.docx')
+    image_path = os.path.join(work_dir, 'image.png')
+    generate_template(config, template_path)
+    generate_image(config, image_path)
+    datas = generate_datas(config, image_path)
+
+    check_times = [_time(lambda: TemplateAnalyzer.check_template(template_path)) for _ in range(repeat)]
+    compile_times = [_time(lambda: CompiledTemplate.compile(template_path)) for _ in range(repeat)]
+    template = CompiledTemplate.compile(template_path)['data']['template']
+
+    context = RenderContext()
+    new_document_times, label_times = [], defaultdict(list)
+    save_times, save_sizes = defaultdict(list), defaultdict(list)
+    for datas_item in datas:
+        context.register_static_datas()
+        start = time.perf_counter()
+        document, no_content_points, insert_points = template.new_document()
+        new_document_times.append(time.perf_counter() - start)
+
+        for point_data in no_content_points:
+            label = context.get_label(point_data['type'])
+            label_times[point_data['type']].append(
+                _time(lambda: label.insert_data_to_point(point_data, None, context.static_datas)))
+        for name, point_data in insert_points.items():
+            label = context.get_label(point_data['type'])
+            label_times[point_data['type']].append(
+                _time(lambda: label.insert_data_to_point(point_data, datas_item[name], context.static_datas)))
+
+        for compression in Compression:
+            buf = io.BytesIO()
+            save_times[compression.name].append(_time(lambda: template.save(document, buf, compression=compression)))
+            save_sizes[compression.name].append(buf.tell())
+        buf = io.BytesIO()
+        save_times['full'].append(_time(lambda: document.save(buf)))
+        save_sizes['full'].append(buf.tell())
+
+    return {
+        'config': config.to_dict(),
+        'environment': {'python': sys.version.split()[0], 'python-docx': docx.__version__,
+                        'platform': platform.platform(), 'time': time.strftime('%Y-%m-%d %H:%M:%S')},
+        'check_template': summarize(check_times),
+        'compile': summarize(compile_times),
+        'new_document': summarize(new_document_times),
+        'labels': {label_type: summarize(times) for label_type, times in sorted(label_times.items())},
+        'save': {name: dict(summarize(times), size=sum(save_sizes[name]) // len(save_sizes[name]))
+                 for name, times in save_times.items()},
+    }
+
+
+def _iter_metrics(result: dict, prefix: str = ''):
+    """生成 (指标名称, 统计字典) 二元组"""
+    for key, value in result.items():
+        if key in ('config', 'environment') or not isinstance(value, dict):
+            continue
+        if 'count' in value:
+            yield prefix + key, value
+        else:
+            yield from _iter_metrics(value, f'{prefix}{key}.')
+
+
+def compare(base: dict, result: dict, stat: str = 'p50'):
+    """打印两次测试结果的对比，比值小于 1 表示变快"""
+    base_metrics = dict(_iter_metrics(base))
+    print(f"{'指标':<32}{'基准':>12}{'本次':>12}{'比值':>8}")
+    for name, value in _iter_metrics(result):
+        base_value = base_metrics.get(name, {}).get(stat)
+        if value.get(stat) is None or not base_value:
+            continue
+        print(f"{name:<32}{base_value * 1000:>10.3f}ms{value[stat] * 1000:>10.3f}ms{value[stat] / base_value:>8.2f}")
+
+
+def print_result(result: dict):
+    print(f"{'指标':<32}{'次数':>8}{'p50':>12}{'p99':>12}{'总计':>12}")
+    for name, value in _iter_metrics(result):
+        if value['count']:
+            print(f"{name:<32}{value['count']:>8}{value['p50'] * 1000:>10.3f}ms{value['p99'] * 1000:>10.3f}ms"
+                  f"{value['total']:>11.3f}s")
+
+
+def main(argv: list[str] = None):
+    parser = argparse.ArgumentParser(description='模板文档生成性能基准测试')
+    defaults = BenchmarkConfig()
+    for key, value in defaults.to_dict().items():
+        parser.add_argument(f"--{key.replace('_', '-')}", type=int, default=value)
+    parser.add_argument('--repeat', type=int, default=5, help='模板校验与编译的重复次数')
+    parser.add_argument('--work-dir', help='存放合成模板与图片的目录，默认使用临时目录')
+    parser.add_argument('--out', help='测试结果 JSON 文件路径')
+    parser.add_argument('--compare', help='作为对比基准的测试结果 JSON 文件路径')
+    args = parser.parse_args(argv)
+
+    config = BenchmarkConfig(**{key: getattr(args, key) for key in defaults.to_dict()})
+    if args.work_dir:
+        os.makedirs(args.work_dir, exist_ok=True)
+        result = run_benchmark(config, args.work_dir, args.repeat)
+    else:
+        with tempfile.TemporaryDirectory() as work_dir:
+            result = run_benchmark(config, work_dir, args.repeat)
+
+    print_result(result)
+    if args.out:
+        with open(args.out, 'w', encoding='utf-8') as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            base = json.load(f)
+        print()
+        compare(base, result)
+
+
+if __name__ == '__main__':
+    main()
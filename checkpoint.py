@@ -0,0 +1,121 @@
+import datetime
+import decimal
+import hashlib
+import json
+import os
+import sys
+
+
+class _UnstableValue(Exception):
+    """值无法稳定地计算哈希"""
+
+
+def _hashable_value(obj):
+    """json.dumps 的 default 函数，将 JSON 不支持的值转换为能稳定表示其内容的值"""
+    np = sys.modules.get('numpy')
+    if np is not None:
+        if isinstance(obj, np.ndarray):
+            if obj.dtype.hasobject:
+                return {'__ndarray__': 'object', 'shape': obj.shape, 'values': obj.tolist()}
+            # str(ndarray) 会省略元素并按打印精度舍入，使用完整的字节内容
+            return {'__ndarray__': obj.dtype.str, 'shape': obj.shape, 'sha256': hashlib.sha256(obj.tobytes()).hexdigest()}
+        if isinstance(obj, np.generic):
+            return obj.item()
+    if isinstance(obj, (datetime.date, datetime.time, datetime.timedelta, decimal.Decimal)):
+        return f'{type(obj).__name__}:{obj}'
+    # 生成器、TableRows、TableColumns 等值的 str 通常只含对象地址，且可能只能迭代一次
+    raise _UnstableValue
+
+
+def _file_state(path: str):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return [os.path.abspath(path), None, None]
+    return [os.path.abspath(path), stat.st_mtime_ns, stat.st_size]
+
+
+def hash_datas(datas: dict, data_files: list = None) -> [str, None]:
+    """
+    计算插入内容字典的哈希，键的顺序不影响结果
+
+    NumPy 数组按 dtype、形状与字节内容计算哈希；含有无法稳定计算哈希的值（如生成器、TableRows、TableColumns）时返回 None，
+    这样的数据不能被断点清单跳过，也不使用生成结果缓存
+
+    :param data_files: 插入内容引用的本地文件路径列表（见 CompiledTemplate.get_data_files），文件的修改时间与大小计入哈希，
+                       同一路径的图片被替换后哈希随之变化
+    """
+    try:
+        s = json.dumps(datas, sort_keys=True, ensure_ascii=False, default=_hashable_value)
+    except _UnstableValue:
+        return None
+    if data_files:
+        s += json.dumps([_file_state(path) for path in data_files], ensure_ascii=False)
+    return hashlib.sha256(s.encode('utf-8')).hexdigest()
+
+
+class Checkpoint:
+    """
+    批量生成的断点清单，以 JSON Lines 格式追加记录每组数据的 (记录键, 模板哈希, 数据哈希, 生成选项, 输出路径, 状态)
+
+    重新运行时，记录键、模板哈希、数据哈希、生成选项与输出路径都相同、状态为成功且输出文件仍存在的数据会被跳过，
+    因此中断后重新运行或少量修改输入后重新运行只会生成变化的部分。含有无法稳定计算哈希的值的数据（见 hash_datas）每次都会重新生成
+    """
+
+    def __init__(self, manifest_path: str, template_hash: str, key: str = None, options: str = None):
+        """
+        :param manifest_path: 清单文件路径，不存在时新建
+        :param template_hash: 模板哈希，见 CompiledTemplate.template_hash
+        :param key: 作为记录键的内容标签名称，默认使用分片序号与数据序号，输入数据的顺序会变化时应指定唯一的字段
+        :param options: 生成选项指纹，见 RenderOptions.fingerprint，选项改变（如压缩方式、图片分辨率）后所有数据重新生成
+        """
+        self.manifest_path = manifest_path
+        self.template_hash = template_hash
+        self.key = key
+        self.options = options
+        # 记录键到最后一条记录的字典
+        self._entries = {}
+        if os.path.exists(manifest_path):
+            with open(manifest_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    if line.strip():
+                        try:
+                            entry = json.loads(line)
+                        except json.JSONDecodeError:
+                            # 中断时可能写入不完整的最后一行
+                            continue
+                        self._entries[entry['key']] = entry
+        self._file = None
+
+    def record_key(self, index: int, datas: dict, shard: int = 0) -> str:
+        if self.key is not None:
+            return str(datas.get(self.key))
+        return f'{shard}:{index}'
+
+    def is_done(self, record_key: str, data_hash: str, save_path: str) -> bool:
+        """判断数据是否已生成且无需重新生成，数据哈希为 None（见 hash_datas）时总是重新生成"""
+        entry = self._entries.get(record_key)
+        return (data_hash is not None and entry is not None and entry['status'] in ('SUCCESS', 'CACHED') and entry['template_hash'] == self.template_hash
+                and entry.get('options') == self.options and entry['data_hash'] == data_hash and entry['save_path'] == save_path
+                and os.path.exists(save_path))
+
+    def append(self, record_key: str, data_hash: str, save_path: str, status: str):
+        """追加一条记录并立即写入磁盘"""
+        entry = {'key': record_key, 'template_hash': self.template_hash, 'data_hash': data_hash,
+                 'options': self.options, 'save_path': save_path, 'status': status}
+        if self._file is None:
+            self._file = open(self.manifest_path, 'a', encoding='utf-8')
+        self._file.write(json.dumps(entry, ensure_ascii=False) + '\n')
+        self._file.flush()
+        self._entries[record_key] = entry
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
@@ -0,0 +1,266 @@
+import copy
+import hashlib
+import io
+import json
+import os
+import threading
+import zipfile
+from collections import OrderedDict
+from enum import Enum, unique
+
+from docx.opc.packuri import PACKAGE_URI, CONTENT_TYPES_URI
+from docx.opc.pkgwriter import _ContentTypesItem
+from docx.oxml.ns import qn
+from docx.text.paragraph import Paragraph
+from docx.text.run import Run
+
+from helper.zip_helper import RawZipWriter, read_raw_entry
+from instrumentation import Instrumentation, optional_timer
+from template_analyzer import TemplateAnalyzer
+
+
+@unique
+class Compression(Enum):
+    """保存时重新压缩的部件使用的压缩方式，值为 (zip 压缩方式, deflate 压缩级别)"""
+    # 不压缩，文件最大、CPU 占用最少，适合生成后立即被处理或再次打包的中间文件
+    STORED = (zipfile.ZIP_STORED, 0)
+    # 最快的 deflate 压缩
+    FAST = (zipfile.ZIP_DEFLATED, 1)
+    # zlib 默认级别的 deflate 压缩
+    DEFAULT = (zipfile.ZIP_DEFLATED, -1)
+
+
+class CompiledTemplate:
+    """
+    编译后的模板
+
+    模板只解析与校验一次，记录每个插入点所在 run 在部件标签 run 列表（见 TemplateAnalyzer.find_label_runs）中的位置，每次生成文档时克隆编译结果，
+    并按位置直接定位插入点，单次生成只需要填充数据与保存
+    """
+
+    def __init__(self, file_path: str, document, points: list, raw_entries: dict = None, template_hash: str = None):
+        self.file_path = file_path
+        # 模板文件内容的 sha256，用于判断生成结果是否基于当前模板
+        self.template_hash = template_hash
+        self._document = document
+        # 模板 zip 条目名称到 (条目信息, 压缩后的原始字节) 的字典，保存时原样拷贝未修改的部件
+        self._raw_entries = raw_entries or {}
+        # 插入点元信息列表，不含 python-docx 代理对象，元素为 {name, type, text, run_index, part, run_position, no_content}
+        self._points = points
+        self.insert_points = {p['name']: p for p in points if not p['no_content']}
+        # 模板中使用的无内容标签类型，生成结果只与这些类型的静态数据有关
+        self.no_content_types = sorted({p['type'] for p in points if p['no_content']})
+
+    @classmethod
+    def compile(cls, file_path: str, instrumentation: Instrumentation = None) -> dict:
+        """
+        解析并校验模板，成功时记录所有插入点位置
+
+        :param file_path: 模板文件路径
+        :param instrumentation: 计时埋点，记录 compile 阶段与其中 load、scan 阶段的耗时
+
+        :return: 与 TemplateAnalyzer.check_template 格式相同的三元组，成功时 data 为字典，包含 template:编译后的模板 与 insert_points:有内容插入点信息字典
+        """
+        with optional_timer(instrumentation, 'compile', template=file_path):
+            return cls._compile(file_path, instrumentation)
+
+    @classmethod
+    def _compile(cls, file_path: str, instrumentation: Instrumentation) -> dict:
+        with open(file_path, 'rb') as f:
+            template_bytes = f.read()
+        no_content_points = []
+
+        def collect_no_content_point(p_d: dict):
+            # 无内容标签仅记录位置，不在编译阶段插入数据，每次生成时再插入
+            if p_d['type'] in TemplateAnalyzer.insert_point_no_content_types:
+                no_content_points.append(p_d)
+                return True
+            return False
+
+        check_result = TemplateAnalyzer.check_template(io.BytesIO(template_bytes), collect_no_content_point, instrumentation)
+        if check_result['code'].is_error():
+            return check_result
+
+        document = check_result['data']['document']
+        # 部件名称 -> {run 元素: 在部件标签 run 列表中的位置}，文本框等元素的 XPath 路径含有 python-docx 未定义的命名空间前缀，因此不记录路径
+        run_positions = {str(part.partname): {r: i for i, r in enumerate(TemplateAnalyzer.find_label_runs(part.element))}
+                         for part, _ in TemplateAnalyzer.iter_story_parts(document)}
+        points = []
+        for no_content, point_datas in ((True, no_content_points), (False, check_result['data']['insert_points'].values())):
+            for p_d in point_datas:
+                partname = str(p_d['part'].partname)
+                points.append({'name': p_d['name'], 'type': p_d['type'], 'text': p_d['text'], 'run_index': p_d['run_index'],
+                               'part': partname, 'run_position': run_positions[partname][p_d['run'].element],
+                               'no_content': no_content})
+
+        # 只记录从模板加载的部件及其关系，未被引用的孤立条目可能与生成时新增的部件（如插入的图片）同名
+        loaded_names = set()
+        for part in document.part.package.iter_parts():
+            loaded_names.add(part.partname.membername)
+            if len(part.rels):
+                loaded_names.add(part.partname.rels_uri.membername)
+        with zipfile.ZipFile(io.BytesIO(template_bytes)) as zf:
+            raw_entries = {info.filename: (info, read_raw_entry(template_bytes, info))
+                           for info in zf.infolist() if info.filename in loaded_names}
+
+        template = cls(file_path, document, points, raw_entries, hashlib.sha256(template_bytes).hexdigest())
+        return {"code": TemplateAnalyzer.CheckCode.SUCCESS,
+                "msg": "successful",
+                "data": {"template": template, "insert_points": template.insert_points}}
+
+    def get_schema(self) -> dict:
+        """
+        导出模板的数据格式：有内容标签名称 -> 标签类型 -> 数据格式
+
+        :return: {"template": 模板路径, "labels": {标签名称: {"type": 标签类型, "shape": 数据格式说明}}}
+        """
+        return {"template": self.file_path,
+                "labels": {name: {"type": p['type'], "shape": TemplateAnalyzer.get_label(p['type']).get_data_shape()}
+                           for name, p in self.insert_points.items()}}
+
+    def get_data_files(self, datas: dict) -> list:
+        """插入内容引用的本地文件路径列表（如图片），见 Label.get_data_files"""
+        files = []
+        for name, p in self.insert_points.items():
+            if name in datas:
+                label = TemplateAnalyzer.get_label(p['type'])
+                if label is not None:
+                    files.extend(label.get_data_files(datas[name]))
+        return files
+
+    def save_schema(self, schema_path: str):
+        """将模板的数据格式保存为 JSON 文件"""
+        with open(schema_path, 'w', encoding='utf-8') as f:
+            json.dump(self.get_schema(), f, ensure_ascii=False, indent=2)
+
+    def new_document(self):
+        """
+        克隆模板文件，并定位克隆文件中的插入点
+
+        :return: (document, no_content_points, insert_points) 三元组，no_content_points 为无内容插入点列表，insert_points 为有内容插入点信息字典，插入点格式与 check_template 相同
+        """
+        document = copy.deepcopy(self._document)
+        # 编译时 iter_story_parts 在模板上缓存了 _Body，深拷贝得到的是脱离克隆树的 w:body 副本，需丢弃后按克隆树重新创建
+        document._Document__body = None
+        # 部件名称 -> (部件, 段落父对象, 部件标签 run 列表)
+        parts = {str(part.partname): (part, parent, TemplateAnalyzer.find_label_runs(part.element))
+                 for part, parent in TemplateAnalyzer.iter_story_parts(document)}
+
+        # 所有插入点须在修改文档前定位，插入数据会改变后续元素的位置
+        paragraphs = {}
+        no_content_points = []
+        insert_points = {}
+        for p in self._points:
+            part, parent, label_runs = parts[p['part']]
+            r = label_runs[p['run_position']]
+            # run_index 为 None 时 run 不是段落的直接子元素
+            p_element = r.getparent() if p['run_index'] is not None else next(r.iterancestors(qn('w:p')))
+            paragraph = paragraphs.get(p_element)
+            if paragraph is None:
+                paragraph = paragraphs[p_element] = Paragraph(p_element, parent)
+            point_data = {'name': p['name'], 'type': p['type'], 'text': p['text'],
+                          'run': Run(r, paragraph), 'run_index': p['run_index'], 'paragraph': paragraph, 'document': document,
+                          'part': part}
+            if p['no_content']:
+                no_content_points.append(point_data)
+            else:
+                insert_points[p['name']] = point_data
+        return document, no_content_points, insert_points
+
+    # 确定性输出使用的固定 zip 条目时间
+    DETERMINISTIC_DATE_TIME = (1980, 1, 1, 0, 0, 0)
+
+    def save(self, document, file, copy_unchanged: bool = True, deterministic: bool = False,
+             compression: Compression = Compression.DEFAULT) -> [int, None]:
+        """
+        保存由 new_document 生成的文档
+
+        仅重新序列化并压缩可能被修改的部件：正文、页眉、页脚及其关系、包关系、[Content_Types].xml 与模板中不存在的新部件（如插入的图片），
+        其他部件（样式、主题、字体、模板自带的图片等）直接拷贝模板中已压缩的字节。
+        内容标签只能修改正文、页眉与页脚部件，若自定义标签修改了其他部件，需要使用 copy_unchanged=False 完整保存
+
+        :param document: 由 new_document 生成的文档
+        :param file: 输出文件路径或可写的二进制文件对象
+        :param copy_unchanged: 是否原样拷贝未修改的部件，为 False 时重新序列化并压缩所有部件
+        :param deterministic: 确定性输出，部件按名称排序并使用固定的 zip 条目时间，相同的模板与数据（包括静态数据）生成的文件字节完全相同
+        :param compression: 重新压缩的部件使用的压缩方式，原样拷贝的部件保持模板中的压缩方式
+
+        :return: 写入的字节数，模板没有原始压缩数据时使用 document.save 保存，返回 None
+        """
+        if not self._raw_entries:
+            document.save(file)
+            return None
+        compress_type, compress_level = compression.value
+
+        package = document.part.package
+        parts = list(package.iter_parts())
+        if deterministic:
+            parts.sort(key=lambda part: part.partname)
+        changed_partnames = {part.partname for part, _ in TemplateAnalyzer.iter_story_parts(document)}
+        date_time = self.DETERMINISTIC_DATE_TIME if deterministic else None
+
+        with RawZipWriter(file) as writer:
+            def write(name: str, blob_getter, copy_raw: bool):
+                raw_entry = self._raw_entries.get(name) if copy_raw and copy_unchanged else None
+                if raw_entry is not None:
+                    writer.write_raw(*raw_entry)
+                else:
+                    writer.writestr(name, blob_getter(), compress_type, compress_level, date_time)
+
+            write(CONTENT_TYPES_URI.membername, lambda: _ContentTypesItem.from_parts(parts).blob, False)
+            write(PACKAGE_URI.rels_uri.membername, lambda: package.rels.xml, False)
+            for part in parts:
+                unchanged = part.partname not in changed_partnames
+                write(part.partname.membername, lambda: part.blob, unchanged)
+                if len(part.rels):
+                    write(part.partname.rels_uri.membername, lambda: part.rels.xml, unchanged)
+        return writer.size
+
+
+class TemplateCache:
+    """进程内编译模板缓存，以模板路径、修改时间与文件大小为键，按最近最少使用淘汰"""
+
+    def __init__(self, max_size: int = 16):
+        self.max_size = max_size
+        self._templates = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(file_path: str):
+        stat = os.stat(file_path)
+        return os.path.abspath(file_path), stat.st_mtime_ns, stat.st_size
+
+    def get(self, file_path: str, instrumentation: Instrumentation = None) -> dict:
+        """
+        获取编译后的模板，未命中时编译并缓存，模板文件被修改后自动重新编译
+
+        :param instrumentation: 计时埋点，未命中时记录编译耗时，见 CompiledTemplate.compile
+
+        :return: 与 CompiledTemplate.compile 格式相同的三元组，校验失败的模板不会被缓存
+        """
+        key = self._key(file_path)
+        with self._lock:
+            template = self._templates.get(key)
+            if template is not None:
+                self._templates.move_to_end(key)
+                return {"code": TemplateAnalyzer.CheckCode.SUCCESS,
+                        "msg": "successful",
+                        "data": {"template": template, "insert_points": template.insert_points}}
+
+        check_result = CompiledTemplate.compile(file_path, instrumentation)
+        if check_result['code'].is_error():
+            return check_result
+
+        with self._lock:
+            self._templates[key] = check_result['data']['template']
+            self._templates.move_to_end(key)
+            while len(self._templates) > self.max_size:
+                self._templates.popitem(last=False)
+        return check_result
+
+    def clear(self):
+        with self._lock:
+            self._templates.clear()
+
+
+template_cache = TemplateCache()
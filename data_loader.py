@@ -1,12 +1,35 @@
+import csv
+import json
+import os
+import zlib
 from abc import ABCMeta, abstractmethod
+from collections import deque
+
+
+def check_shard(shard_index: int, shard_count: int):
+    if shard_count < 1 or not 0 <= shard_index < shard_count:
+        raise ValueError(f"分片参数错误：shard_index={shard_index}，shard_count={shard_count}，要求 0 <= shard_index < shard_count")
+
+
+def key_shard(value, shard_count: int) -> int:
+    """根据键值计算所属分片，不同进程与机器的结果一致（不使用受随机化影响的 hash）"""
+    return zlib.crc32(str(value).encode('utf-8')) % shard_count
 
 
 class DataLoader(metaclass=ABCMeta):
+    # 当前加载器负责的数据分片，多台机器分别处理不同分片，默认不分片
+    shard_index = 0
+    shard_count = 1
+
     @abstractmethod
     def load_data(self) -> [dict, None]:
         """加载单组数据，返回内容标签名称和内容，多次加载分别返回每组数据，若无数据，返回 None"""
         pass
 
+    def __iter__(self):
+        """迭代加载剩余的每组数据，等价于重复调用 load_data 直到返回 None"""
+        return iter(self.load_data, None)
+
 
 class StaticDataLoader(DataLoader):
     """静态数据加载器，存储所有数据并依次加载"""
@@ -20,3 +43,203 @@ class StaticDataLoader(DataLoader):
         data = self._datas[self._index]
         self._index += 1
         return data
+
+
+class ShardedDataLoader(DataLoader):
+    """
+    分片数据加载器，包装任意数据加载器，只返回属于指定分片的数据
+
+    按数据序号（第 i 组数据属于第 i % shard_count 个分片）或按键值的哈希分配分片，每台机器使用相同的数据源与不同的 shard_index 即可无协调地分担任务。
+    被包装的加载器仍会加载所有数据，数据源支持时优先使用其自带的分片功能（如 JsonLinesDataLoader 按字节范围分片）
+    """
+
+    def __init__(self, data_loader: DataLoader, shard_index: int, shard_count: int, key: str = None):
+        """
+        :param data_loader: 被包装的数据加载器
+        :param shard_index: 当前分片序号，从 0 开始
+        :param shard_count: 分片总数
+        :param key: 按该内容标签的值的哈希分配分片，默认按数据序号分配
+        """
+        check_shard(shard_index, shard_count)
+        self._data_loader = data_loader
+        self.shard_index = shard_index
+        self.shard_count = shard_count
+        self.key = key
+        self._index = 0
+
+    def load_data(self) -> [dict, None]:
+        while (data := self._data_loader.load_data()) is not None:
+            index = self._index
+            self._index += 1
+            if self.key is None:
+                shard = index % self.shard_count
+            else:
+                shard = key_shard(data.get(self.key), self.shard_count)
+            if shard == self.shard_index:
+                return data
+        return None
+
+
+class ChunkedDataLoader(DataLoader, metaclass=ABCMeta):
+    """
+    分块数据加载器，每次从数据源读取 chunk_size 组数据缓存，内存占用与数据总量无关
+
+    数据源在首次加载时打开，读取完毕或调用 close 时关闭，也可以使用 with 语句
+    """
+
+    def __init__(self, chunk_size: int = 1000):
+        self.chunk_size = chunk_size
+        self._buffer = deque()
+        self._exhausted = False
+
+    @abstractmethod
+    def _load_chunk(self) -> list[dict]:
+        """从数据源读取至多 chunk_size 组数据，读取完毕时返回空列表"""
+        pass
+
+    def close(self):
+        """关闭数据源"""
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def load_data(self) -> [dict, None]:
+        if not self._buffer and not self._exhausted:
+            chunk = self._load_chunk()
+            if chunk:
+                self._buffer.extend(chunk)
+            else:
+                self._exhausted = True
+                self.close()
+        if not self._buffer:
+            return None
+        return self._buffer.popleft()
+
+
+class JsonLinesDataLoader(ChunkedDataLoader):
+    """
+    JSON Lines 文件数据加载器，每行为一组数据的 JSON 对象，忽略空行
+
+    支持按字节范围分片：文件按大小均分为 shard_count 段，每行属于其起始字节所在的分片，各分片直接定位到自己的范围，不读取与解析其他分片的数据
+    """
+
+    def __init__(self, file_path: str, chunk_size: int = 1000, encoding: str = 'utf-8',
+                 shard_index: int = 0, shard_count: int = 1):
+        super().__init__(chunk_size)
+        check_shard(shard_index, shard_count)
+        self.file_path = file_path
+        self.encoding = encoding
+        self.shard_index = shard_index
+        self.shard_count = shard_count
+        self._file = None
+        self._end = None
+
+    def _open(self):
+        self._file = open(self.file_path, 'rb')
+        size = os.fstat(self._file.fileno()).st_size
+        start = size * self.shard_index // self.shard_count
+        self._end = size * (self.shard_index + 1) // self.shard_count
+        if start > 0:
+            # 跳过起始于上一分片的行
+            self._file.seek(start - 1)
+            self._file.readline()
+
+    def _load_chunk(self) -> list[dict]:
+        if self._file is None:
+            self._open()
+        chunk = []
+        while len(chunk) < self.chunk_size and self._file.tell() < self._end:
+            line = self._file.readline()
+            if not line:
+                break
+            if line.strip():
+                chunk.append(json.loads(line.decode(self.encoding)))
+        return chunk
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class CsvDataLoader(ChunkedDataLoader):
+    """CSV 文件数据加载器，首行为列名，每行为一组数据，内容均为字符串"""
+
+    def __init__(self, file_path: str, mapping: dict = None, chunk_size: int = 1000, encoding: str = 'utf-8', **fmtparams):
+        """
+        :param file_path: CSV 文件路径
+        :param mapping: 列名到内容标签名称的字典，指定时只加载字典中的列，默认加载所有列且标签名称与列名相同
+        :param chunk_size: 每次读取的数据组数
+        :param encoding: 文件编码
+        :param fmtparams: csv.reader 的格式参数，如 delimiter
+        """
+        super().__init__(chunk_size)
+        self.file_path = file_path
+        self.mapping = mapping
+        self.encoding = encoding
+        self.fmtparams = fmtparams
+        self._file = None
+        self._reader = None
+
+    def _load_chunk(self) -> list[dict]:
+        if self._file is None:
+            self._file = open(self.file_path, 'r', encoding=self.encoding, newline='')
+            self._reader = csv.DictReader(self._file, **self.fmtparams)
+        chunk = []
+        for row in self._reader:
+            if self.mapping is None:
+                chunk.append(row)
+            else:
+                chunk.append({label_name: row[column] for column, label_name in self.mapping.items()})
+            if len(chunk) >= self.chunk_size:
+                break
+        return chunk
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = self._reader = None
+
+
+class SqliteDataLoader(ChunkedDataLoader):
+    """SQLite 查询数据加载器，查询结果每行为一组数据，列名为内容标签名称"""
+
+    def __init__(self, db_path: str, query: str, params=(), mapping: dict = None, chunk_size: int = 1000):
+        """
+        :param db_path: 数据库文件路径
+        :param query: 查询语句
+        :param params: 查询参数
+        :param mapping: 列名到内容标签名称的字典，指定时只加载字典中的列，默认加载所有列且标签名称与列名相同
+        :param chunk_size: 每次读取的数据组数
+        """
+        super().__init__(chunk_size)
+        self.db_path = db_path
+        self.query = query
+        self.params = params
+        self.mapping = mapping
+        self._connection = None
+        self._cursor = None
+        self._columns = None
+
+    def _load_chunk(self) -> list[dict]:
+        if self._connection is None:
+            import sqlite3
+            self._connection = sqlite3.connect(self.db_path)
+            self._cursor = self._connection.execute(self.query, self.params)
+            self._columns = [d[0] for d in self._cursor.description]
+        chunk = []
+        for row in self._cursor.fetchmany(self.chunk_size):
+            datas = dict(zip(self._columns, row))
+            if self.mapping is not None:
+                datas = {label_name: datas[column] for column, label_name in self.mapping.items()}
+            chunk.append(datas)
+        return chunk
+
+    def close(self):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = self._cursor = None
@@ -0,0 +1,102 @@
+import json
+import os
+from typing import Callable, Iterable
+
+from data_loader import CsvDataLoader, DataLoader, JsonLinesDataLoader
+from template_analyzer import TemplateAnalyzer, RenderContext
+
+
+class DataValidator:
+    """
+    数据校验器，根据模板导出的数据格式（见 CompiledTemplate.get_schema）批量校验数据，不需要加载模板文件
+
+    校验复用各内容标签的 check_data_type，在生成前一次性找出所有数据类型错误的记录。
+    check_data_type 对惰性数据只做有限的检查：表格数据为行迭代器（Iterator）时总是通过，TableRows 只检查表头，
+    每行数据在生成时插入表格前才校验，因此流式表格数据的行错误不会在预先校验中发现
+    """
+
+    def __init__(self, schema: dict, context: RenderContext = None):
+        """
+        :param schema: 模板的数据格式
+        :param context: 渲染上下文，提供标签注册信息，默认使用 TemplateAnalyzer 的全局注册信息
+        """
+        if context is None:
+            context = TemplateAnalyzer
+        self.schema = schema
+        # (标签名称, 标签类型, 数据检查函数) 列表，校验时不再查找标签
+        self._checks = []
+        for name, label_info in schema['labels'].items():
+            label = context.get_label(label_info['type'])
+            if label is None:
+                raise ValueError(f"数据格式中的内容标签'{name}'类型'{label_info['type']}'未注册")
+            self._checks.append((name, label_info['type'], label.check_data_type))
+
+    @classmethod
+    def from_schema_file(cls, schema_path: str, context: RenderContext = None) -> 'DataValidator':
+        """从 CompiledTemplate.save_schema 保存的 JSON 文件创建校验器"""
+        with open(schema_path, 'r', encoding='utf-8') as f:
+            return cls(json.load(f), context)
+
+    def check_record(self, datas, require_all: bool = False) -> list[str]:
+        """
+        校验单组数据
+
+        :param datas: 插入内容字典
+        :param require_all: 是否要求模板中的每个有内容标签都有对应数据
+
+        :return: 错误信息列表，为空表示校验通过
+        """
+        if not isinstance(datas, dict):
+            return [f"数据类型应为 dict，实际为 {type(datas)}"]
+        errors = []
+        for name, label_type, check_data_type in self._checks:
+            if name in datas:
+                if not check_data_type(datas[name]):
+                    errors.append(f"内容标签'{name}'类型 {label_type} 不能匹配数据 {type(datas[name])}")
+            elif require_all:
+                errors.append(f"内容标签'{name}'类型 {label_type} 缺少数据")
+        return errors
+
+    def validate(self, datas: [DataLoader, Iterable[dict], Callable[[], Iterable[dict]], str],
+                 require_all: bool = False) -> list[dict]:
+        """
+        校验整个数据集
+
+        校验会迭代数据直到结束，数据加载器与迭代器校验后不能再用于生成。先校验再生成时，传入创建数据加载器的函数或数据文件路径，
+        校验使用单独创建的加载器，生成时再创建新的加载器
+
+        :param datas: 数据加载器、插入内容字典的可迭代对象、返回二者之一的无参数函数（如 lambda: JsonLinesDataLoader(path)），
+                      或数据文件路径（.jsonl 使用 JsonLinesDataLoader，.csv 使用 CsvDataLoader 的默认参数）
+        :param require_all: 是否要求模板中的每个有内容标签都有对应数据
+
+        :return: 校验失败的记录列表，元素为字典，包含 index:数据序号 与 errors:错误信息列表，为空表示全部校验通过
+        """
+        if isinstance(datas, str):
+            datas = self._open_data_file(datas)
+        elif callable(datas):
+            datas = datas()
+        bad_records = []
+        for index, record in enumerate(datas):
+            errors = self.check_record(record, require_all)
+            if errors:
+                bad_records.append({'index': index, 'errors': errors})
+        return bad_records
+
+    @staticmethod
+    def _open_data_file(file_path: str) -> DataLoader:
+        ext = os.path.splitext(file_path)[1].lower()
+        if ext == '.jsonl':
+            return JsonLinesDataLoader(file_path)
+        if ext == '.csv':
+            return CsvDataLoader(file_path)
+        raise ValueError(f"不支持的数据文件类型 '{ext}'，请传入数据加载器或创建数据加载器的函数")
+
+    @staticmethod
+    def print_validate_info(bad_records: list[dict]):
+        """打印校验结果"""
+        if len(bad_records) == 0:
+            print("数据校验成功")
+            return
+        print(f"数据校验失败，共有 {len(bad_records)} 组数据有误：")
+        for record in bad_records:
+            print(f"\t({record['index']}) " + "；".join(record['errors']))
@@ -1,33 +1,81 @@
-from template_analyzer import TemplateAnalyzer
+from template_analyzer import TemplateAnalyzer, RenderContext
 
 
 class DocumentProcessor:
+    """
+    文档处理器
+
+    各方法的 context 参数为渲染上下文 RenderContext，未指定时使用 TemplateAnalyzer 类属性中的全局注册信息与静态数据（非线程安全）。
+    上下文设置了计时埋点时，记录每个标签插入数据的耗时（no_content 与 label 阶段），数据类型不匹配时发出 data_type_error 事件而不打印
+    """
+
     @staticmethod
-    def insert_data_to_no_content_point(p_d: dict):
+    def insert_data_to_no_content_point(p_d: dict, context: RenderContext = None):
         """校验模板并在预处理阶段插入无内容标签的信息"""
+        if context is None:
+            context = TemplateAnalyzer
         p_t = p_d['type']
-        if p_t in TemplateAnalyzer.insert_point_no_content_types:
-            no_content_label = TemplateAnalyzer.registered_labels[p_t]
-            no_content_label.insert_data_to_point(p_d, None, TemplateAnalyzer.static_datas)
+        no_content_label = context.get_label(p_t)
+        if no_content_label is not None and not no_content_label.has_content():
+            instrumentation = context.instrumentation
+            if instrumentation is None:
+                no_content_label.insert_data_to_point(p_d, None, context.static_datas)
+            else:
+                instrumentation.begin()
+                try:
+                    no_content_label.insert_data_to_point(p_d, None, context.static_datas)
+                finally:
+                    instrumentation.end('no_content', label_type=p_t)
             return True
         return False
 
     @staticmethod
-    def solve_content_labels(insert_points, datas):
+    def solve_content_labels(insert_points, datas, context: RenderContext = None):
         """处理有内容类型插入点，检查并插入数据"""
+        if context is None:
+            context = TemplateAnalyzer
+        instrumentation = context.instrumentation
         no_data_points = {}
         for point_name, point_data in insert_points.items():
             if point_name in datas:
                 data = datas[point_name]
-                label = TemplateAnalyzer.registered_labels[point_data['type']]
+                label = context.get_label(point_data['type'])
                 if not label.check_data_type(data):
-                    print(f"插入内容类型 {point_data['type']} 不能匹配数据 {type(data)}。内容标签为 {point_data['text']}，原文为 {point_data['run'].text}")
+                    if instrumentation is None:
+                        print(f"插入内容类型 {point_data['type']} 不能匹配数据 {type(data)}。内容标签为 {point_data['text']}，原文为 {point_data['run'].text}")
+                    else:
+                        instrumentation.emit('data_type_error', 0.0, label_type=point_data['type'], label_name=point_name,
+                                             data_type=type(data).__name__)
                     continue
-                label.insert_data_to_point(point_data, data, TemplateAnalyzer.static_datas)
+                if instrumentation is None:
+                    label.insert_data_to_point(point_data, data, context.static_datas)
+                else:
+                    instrumentation.begin()
+                    try:
+                        label.insert_data_to_point(point_data, data, context.static_datas)
+                    finally:
+                        instrumentation.end('label', label_type=point_data['type'], label_name=point_name)
             else:
                 no_data_points[point_name] = point_data
         return no_data_points
 
+    @staticmethod
+    def render_document(template, datas: dict, context: RenderContext = None):
+        """
+        基于编译后的模板生成一份文档
+
+        :param template: 编译后的模板 CompiledTemplate
+        :param datas: 插入内容字典
+        :param context: 渲染上下文，需要在调用前注册静态数据
+
+        :return: (document, no_data_points) 二元组，document 为填充数据后的文档，no_data_points 为没有对应数据的插入点
+        """
+        document, no_content_points, insert_points = template.new_document()
+        for point_data in no_content_points:
+            DocumentProcessor.insert_data_to_no_content_point(point_data, context)
+        no_data_points = DocumentProcessor.solve_content_labels(insert_points, datas, context)
+        return document, no_data_points
+
     @staticmethod
     def print_no_data_points(no_data_points):
         """无数据的插入点的默认打印函数"""
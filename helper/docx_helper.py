@@ -1,15 +1,29 @@
+import copy
+import weakref
+
 from docx import Document
 from docx.enum.dml import MSO_THEME_COLOR_INDEX
+from docx.image.image import Image
 from docx.opc.constants import RELATIONSHIP_TYPE
-from docx.oxml import OxmlElement, CT_R, CT_P
+from docx.oxml import OxmlElement, CT_R, CT_P, CT_Inline, CT_Tbl
 from docx.oxml.ns import qn
+from docx.shape import InlineShape
 from docx.text import font
 from docx.text.paragraph import Paragraph
 from docx.text.parfmt import ParagraphFormat
 from docx.text.run import Run
 
 
-def add_style(t_d: Document, f_s_n: str, f_d=Document()):
+# add_style 默认的样式来源文档，首次使用时才解析 python-docx 的默认模板，避免导入模块时的开销
+_default_style_document = None
+
+
+def add_style(t_d: Document, f_s_n: str, f_d=None):
+    global _default_style_document
+    if f_d is None:
+        if _default_style_document is None:
+            _default_style_document = Document()
+        f_d = _default_style_document
     _style = f_d.styles[f_s_n]
     t_d.styles.element.append(_style.element)
 
@@ -67,10 +81,49 @@ def copy_paragraph_style(to_paragraph: Paragraph, from_paragraph: Paragraph, fro
 
 
 def delete_paragraph(paragraph: [Paragraph, Run]):
-    """删除段落"""
+    """删除段落，表格单元格必须以段落结尾，删除单元格的最后一个段落后在末尾添加空段落"""
     p = paragraph._element
-    p.getparent().remove(p)
+    parent = p.getparent()
+    parent.remove(p)
     paragraph._p = paragraph._element = None
+    if parent.tag == qn('w:tc') and (len(parent) == 0 or parent[-1].tag != qn('w:p')):
+        parent.append(OxmlElement('w:p'))
+
+
+class HyperlinkRelationships:
+    """
+    部件的超链接关系索引（url -> rId），同一部件在整个生成过程中复用同一个索引
+
+    part.relate_to 每次都要遍历部件的所有关系查找重复项与可用的 rId，链接较多时耗时为平方级，使用索引后添加一个链接的耗时为 O(1)。
+    相同 url 的超链接共用一个关系
+    """
+    _indexes = weakref.WeakKeyDictionary()
+
+    def __init__(self, part):
+        self._rels = part.rels
+        self._url_r_ids = {rel.target_ref: r_id for r_id, rel in part.rels.items()
+                           if rel.is_external and rel.reltype == RELATIONSHIP_TYPE.HYPERLINK}
+        self._next_id = len(part.rels) + 1
+
+    @classmethod
+    def of(cls, part) -> 'HyperlinkRelationships':
+        """获取部件的超链接关系索引，不存在时创建"""
+        index = cls._indexes.get(part)
+        if index is None:
+            index = cls._indexes[part] = cls(part)
+        return index
+
+    def get_or_add(self, url: str) -> str:
+        """获取 url 对应的超链接关系 id，不存在时创建"""
+        r_id = self._url_r_ids.get(url)
+        if r_id is None:
+            # 其他代码（如插入图片）也可能添加关系，跳过已被占用的 id
+            while f'rId{self._next_id}' in self._rels:
+                self._next_id += 1
+            r_id = f'rId{self._next_id}'
+            self._rels.add_relationship(RELATIONSHIP_TYPE.HYPERLINK, url, r_id, is_external=True)
+            self._url_r_ids[url] = r_id
+        return r_id
 
 
 def add_hyperlink(paragraph: Paragraph, text: str, url: str):
@@ -80,7 +133,7 @@ def add_hyperlink(paragraph: Paragraph, text: str, url: str):
     :param text: 文本
     :param url: 链接
     """
-    r_id = paragraph.part.relate_to(url, RELATIONSHIP_TYPE.HYPERLINK, is_external=True)  # 关联超链接
+    r_id = HyperlinkRelationships.of(paragraph.part).get_or_add(url)  # 关联超链接
 
     hyperlink = OxmlElement('w:hyperlink')
     hyperlink.set(qn('r:id'), r_id)
@@ -95,10 +148,13 @@ def add_hyperlink(paragraph: Paragraph, text: str, url: str):
 
 def set_hyperlink(run_index: int, paragraph: Paragraph, text: str, url: str):
     """设置 run 为超链接，抹除原内容，添加超链接样式调整，其他样式保留"""
-    run = paragraph.runs[run_index]
+    return set_run_hyperlink(paragraph.runs[run_index], text, url)
+
 
-    # 在 document 的 part （rels文档资源） 中创建一个新的超链接资源并获取其 id
-    r_id = paragraph.part.relate_to(url, RELATIONSHIP_TYPE.HYPERLINK, is_external=True)  # 关联超链接
+def set_run_hyperlink(run: Run, text: str, url: str):
+    """设置 run 为超链接，抹除原内容，添加超链接样式调整，其他样式保留。直接使用 run 对象，不需要按序号查找"""
+    # 在 run 所在的 part （rels文档资源） 中获取或创建超链接资源并获取其 id
+    r_id = HyperlinkRelationships.of(run.part).get_or_add(url)
 
     # 创建一个超链接的ooxml对象并将申请得到的超链接资源 id 作为其 id 属性
     hyperlink = OxmlElement('w:hyperlink')
@@ -106,7 +162,7 @@ def set_hyperlink(run_index: int, paragraph: Paragraph, text: str, url: str):
 
     # 创建链接内的内容 run
     new_r = OxmlElement('w:r')
-    new_run = Run(new_r, paragraph)
+    new_run = Run(new_r, run._parent)
 
     # 设置链接内容的文本与样式
     new_run.text = text
@@ -121,3 +177,96 @@ def set_hyperlink(run_index: int, paragraph: Paragraph, text: str, url: str):
     delete_paragraph(run)
 
     return hyperlink
+
+
+def add_picture_from_image(run: Run, image: Image, width=None, height=None):
+    """使用已读取并解析的图片对象在 run 末尾添加图片，不重复读取、哈希与解析图片文件，用法同 run.add_picture"""
+    part = run.part
+    image_parts = part.package.image_parts
+    # 同一文档内相同的图片只保存一份
+    image_part = image_parts._get_by_sha1(image.sha1)
+    if image_part is None:
+        image_part = image_parts._add_image_part(image)
+    r_id = part.relate_to(image_part, RELATIONSHIP_TYPE.IMAGE)
+
+    cx, cy = image.scaled_dimensions(width, height)
+    inline = CT_Inline.new_pic_inline(part.next_id, r_id, image.filename, cx, cy)
+    run.element.add_drawing(inline)
+    return InlineShape(inline)
+
+
+def _set_template_run_text(r: CT_R, text: str):
+    """设置由模板拷贝得到的 run 的文本，run 的最后一个子元素为空的 w:t"""
+    if '\t' in text or '\n' in text or '\r' in text:
+        # 制表符与换行需要转换为 w:tab 与 w:br
+        r.text = text
+    else:
+        t = r[-1]
+        t.text = text
+        if len(text.strip()) < len(text):
+            t.set(qn('xml:space'), 'preserve')
+
+
+def insert_paragraphs_before(paragraph: Paragraph, texts, from_run: Run = None):
+    """
+    在段落前批量插入新段落，新段落拷贝该段落的 w:pPr 与 from_run 的 w:rPr，效果同 insert_paragraph_before 后 copy_paragraph_style，
+    但样式只读取一次，每个新段落直接拷贝 XML
+
+    :param paragraph: 参照段落，新段落依次插入到该段落之前
+    :param texts: 新段落的文本
+    :param from_run: 样式来源 run，默认为 paragraph 的第一个 run；run 不是段落的直接子元素（如位于 w:ins、w:hyperlink 内）时必须指定
+    """
+    if from_run is None:
+        from_run = paragraph.runs[0]
+    p_template = OxmlElement('w:p')
+    if paragraph._p.pPr is not None:
+        pPr = copy.deepcopy(paragraph._p.pPr)
+        # 分节符只属于原段落，不能拷贝到每个新段落
+        pPr._remove_sectPr()
+        p_template.append(pPr)
+    r_template = p_template.add_r()
+    if from_run.element.rPr is not None:
+        r_template.append(copy.deepcopy(from_run.element.rPr))
+    r_template.add_t('')
+
+    p = paragraph._p
+    for text in texts:
+        new_p = copy.deepcopy(p_template)
+        _set_template_run_text(new_p[-1], text)
+        p.addprevious(new_p)
+
+
+def _new_table_cell(width, bold: bool):
+    """创建单元格模板：<w:tc><w:tcPr/><w:p><w:r><w:t/></w:r></w:p></w:tc>"""
+    tc = OxmlElement('w:tc')
+    if width is not None:
+        tc.width = width
+    r = tc.add_p().add_r()
+    if bold:
+        r.get_or_add_rPr().get_or_add_b()
+    r.add_t('')
+    return tc
+
+
+def append_table_rows(tbl: CT_Tbl, rows, bold_first_row: bool = True, bold_first_column: bool = True):
+    """
+    以 XML 方式向表格批量追加行，每个单元格从预先构建的单元格模板拷贝，耗时与单元格数量成线性关系
+
+    :param tbl: 表格元素，列数与列宽由 w:tblGrid 决定
+    :param rows: 行数据 Iterable[Iterable[str]]，每行多出列数的数据被忽略
+    :param bold_first_row: 首行（表头）是否加粗
+    :param bold_first_column: 首列（列头）是否加粗
+    """
+    widths = [grid_col.w for grid_col in tbl.tblGrid.gridCol_lst]
+    normal_cells = [_new_table_cell(w, False) for w in widths]
+    bold_cells = [_new_table_cell(w, True) for w in widths]
+    first_column_bold_cells = bold_cells[:1] + normal_cells[1:] if bold_first_column else normal_cells
+
+    for row_index, row in enumerate(rows):
+        cell_templates = bold_cells if row_index == 0 and bold_first_row else first_column_bold_cells
+        tr = OxmlElement('w:tr')
+        for text, cell_template in zip(row, cell_templates):
+            tc = copy.deepcopy(cell_template)
+            _set_template_run_text(tc[-1][-1], text)
+            tr.append(tc)
+        tbl.append(tr)
@@ -0,0 +1,121 @@
+import math
+import os
+import threading
+from collections import OrderedDict
+
+from docx.image.image import Image
+from docx.shared import Emu
+
+from helper.image_resample import resample_image
+
+
+class ImageCache:
+    """
+    进程内图片缓存，以图片路径、修改时间与文件大小为键，缓存已读取并解析的图片（尺寸、分辨率与待嵌入的内容）
+
+    缓存图片内容总大小超过内存预算时按最近最少使用淘汰，批量生成时每张图片只从磁盘读取一次
+    """
+
+    def __init__(self, max_bytes: int = 256 * 1024 * 1024):
+        """
+        :param max_bytes: 缓存图片内容的总字节数上限
+        """
+        self.max_bytes = max_bytes
+        self._images = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, image_path: str) -> Image:
+        """获取图片，未命中时读取并解析图片文件，图片文件被修改后自动重新读取"""
+        stat = os.stat(image_path)
+        key = (os.path.abspath(image_path), stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            image = self._images.get(key)
+            if image is not None:
+                self._images.move_to_end(key)
+                return image
+
+        image = Image.from_file(image_path)
+        image_size = len(image.blob)
+        # 超过内存预算的图片不缓存
+        if image_size > self.max_bytes:
+            return image
+
+        with self._lock:
+            if key not in self._images:
+                self._images[key] = image
+                self._size += image_size
+            while self._size > self.max_bytes:
+                _, evicted = self._images.popitem(last=False)
+                self._size -= len(evicted.blob)
+        return image
+
+    def clear(self):
+        with self._lock:
+            self._images.clear()
+            self._size = 0
+
+
+image_cache = ImageCache()
+
+
+class ImageVariantCache:
+    """
+    按显示尺寸与目标分辨率缩小后的图片缓存，以 (源图片 sha1, 目标像素宽, 目标像素高) 为键，
+    批量生成时每个尺寸的图片只缩小并压缩一次，缓存总大小超过内存预算时按最近最少使用淘汰
+    """
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, jpeg_quality: int = 85):
+        """
+        :param max_bytes: 缓存图片内容的总字节数上限
+        :param jpeg_quality: 重新压缩 JPEG 图片的质量
+        """
+        self.max_bytes = max_bytes
+        self.jpeg_quality = jpeg_quality
+        self._images = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, image: Image, width: int, height: int, dpi: int) -> Image:
+        """
+        获取适合显示尺寸的图片，源图片的像素不超过显示所需时直接返回源图片（不放大）
+
+        :param image: 源图片
+        :param width: 显示宽度（EMU）
+        :param height: 显示高度（EMU）
+        :param dpi: 目标分辨率（每英寸像素数）
+        """
+        width_px = max(1, math.ceil(Emu(width).inches * dpi))
+        height_px = max(1, math.ceil(Emu(height).inches * dpi))
+        if width_px >= image.px_width or height_px >= image.px_height:
+            return image
+
+        key = (image.sha1, width_px, height_px)
+        with self._lock:
+            item = self._images.get(key)
+            if item is not None:
+                self._images.move_to_end(key)
+                return item[0]
+
+        # 无法缩小时缓存源图片，避免重复尝试；源图片不计入内存预算
+        variant = resample_image(image, width_px, height_px, dpi, self.jpeg_quality) or image
+        variant_size = 0 if variant is image else len(variant.blob)
+        if variant_size > self.max_bytes:
+            return variant
+
+        with self._lock:
+            if key not in self._images:
+                self._images[key] = (variant, variant_size)
+                self._size += variant_size
+            while self._size > self.max_bytes:
+                _, (_, evicted_size) = self._images.popitem(last=False)
+                self._size -= evicted_size
+        return variant
+
+    def clear(self):
+        with self._lock:
+            self._images.clear()
+            self._size = 0
+
+
+image_variant_cache = ImageVariantCache()
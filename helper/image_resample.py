@@ -0,0 +1,56 @@
+import io
+import warnings
+
+from docx.image.image import Image
+
+# Pillow 是可选依赖，只在首次缩小图片时导入；未安装时为 False
+_pil_image = None
+
+
+def _load_pil():
+    global _pil_image
+    if _pil_image is None:
+        try:
+            from PIL import Image as pil_image
+            _pil_image = pil_image
+        except ImportError:
+            warnings.warn('缩小图片需要安装 Pillow，当前未安装，将嵌入原图')
+            _pil_image = False
+    return _pil_image
+
+
+def resample_image(image: Image, width_px: int, height_px: int, dpi: int, jpeg_quality: int = 85) -> [Image, None]:
+    """
+    将图片缩小到指定像素尺寸并重新压缩，JPEG 图片保存为 JPEG，其他位图保存为 PNG（保留透明度）
+
+    :param image: 源图片
+    :param width_px: 目标宽度（像素）
+    :param height_px: 目标高度（像素）
+    :param dpi: 写入图片的分辨率
+    :param jpeg_quality: JPEG 压缩质量
+
+    :return: 缩小后的图片；未安装 Pillow、图片无法处理（如矢量图）或处理后没有变小时返回 None，此时应使用原图
+    """
+    pil_image = _load_pil()
+    if not pil_image:
+        return None
+    try:
+        with pil_image.open(io.BytesIO(image.blob)) as im:
+            is_jpeg = im.format == 'JPEG'
+            if is_jpeg:
+                # JPEG 解码时直接按比例缩小，避免解码完整的大图
+                im.draft(im.mode, (width_px, height_px))
+            if im.mode not in ('RGB', 'RGBA', 'L', 'CMYK'):
+                im = im.convert('RGBA' if 'transparency' in im.info or im.mode in ('LA', 'PA') else 'RGB')
+            resized = im.resize((width_px, height_px), pil_image.LANCZOS)
+            out = io.BytesIO()
+            if is_jpeg:
+                resized.save(out, 'JPEG', quality=jpeg_quality, optimize=True, dpi=(dpi, dpi))
+            else:
+                resized.save(out, 'PNG', optimize=True, dpi=(dpi, dpi))
+    except (OSError, ValueError):
+        return None
+    blob = out.getvalue()
+    if len(blob) >= len(image.blob):
+        return None
+    return Image.from_blob(blob)
@@ -1,4 +1,5 @@
 import os
+import tempfile
 
 
 def make_sure_path(path: str):
@@ -7,3 +8,29 @@ def make_sure_path(path: str):
     """
     if not os.path.exists(path):
         os.makedirs(path)
+
+
+# 进程的文件创建掩码，os.umask 只能在设置的同时读取，在导入时读取一次
+_umask = os.umask(0)
+os.umask(_umask)
+
+
+def replace_file(path: str, write):
+    """
+    先写入同目录下的临时文件，再替换目标文件，不会留下写了一半的文件，也不会修改原文件（可能是其他文件的硬链接）
+
+    临时文件名唯一，多个线程或进程同时写入同一路径时互不覆盖；文件权限与 open 新建的文件相同（0o666 去掉 umask），而不是 mkstemp 的 0o600
+
+    :param path: 目标文件路径
+    :param write: 写入函数，参数为临时文件路径（文件已创建且为空）
+    """
+    fd, tmp = tempfile.mkstemp(suffix='.tmp', dir=os.path.dirname(os.path.abspath(path)))
+    os.close(fd)
+    try:
+        os.chmod(tmp, 0o666 & ~_umask)
+        write(tmp)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
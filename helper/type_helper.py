@@ -1,4 +1,4 @@
-from typing import Iterable
+from typing import Iterable, Iterator
 
 
 def check_iterable_type(obj, ele_type=None) -> bool:
@@ -0,0 +1,131 @@
+import struct
+import time
+import zlib
+from zipfile import ZipInfo, ZIP_DEFLATED, ZIP_STORED
+
+_LOCAL_HEADER = struct.Struct('<4s2B4HL2L2H')
+_LOCAL_HEADER_SIGNATURE = b'PK\003\004'
+_CENTRAL_HEADER = struct.Struct('<4s4B4HL2L5H2L')
+_CENTRAL_HEADER_SIGNATURE = b'PK\001\002'
+_END_RECORD = struct.Struct('<4s4H2LH')
+_END_RECORD_SIGNATURE = b'PK\005\006'
+
+# 标志位：bit 3 表示大小与 crc 写在数据之后的 data descriptor 中，原样拷贝时会去掉
+_FLAG_DATA_DESCRIPTOR = 0x08
+_FLAG_UTF8 = 0x800
+
+
+def read_raw_entry(data: bytes, info: ZipInfo) -> bytes:
+    """
+    读取 zip 条目压缩后的原始字节，不解压
+
+    :param data: 整个 zip 文件的字节
+    :param info: 条目信息
+    """
+    offset = info.header_offset
+    header = _LOCAL_HEADER.unpack_from(data, offset)
+    if header[0] != _LOCAL_HEADER_SIGNATURE:
+        raise ValueError(f"zip 条目 '{info.filename}' 的本地文件头损坏")
+    name_len, extra_len = header[-2], header[-1]
+    start = offset + _LOCAL_HEADER.size + name_len + extra_len
+    return data[start:start + info.compress_size]
+
+
+class RawZipWriter:
+    """
+    流式 zip 写入器，支持将其他 zip 中已压缩的条目字节原样写入，无需解压与重新压缩
+
+    仅支持非 zip64 格式（单个条目与整个文件均小于 4GB）
+    """
+
+    def __init__(self, file):
+        """
+        :param file: 输出文件路径或可写的二进制文件对象
+        """
+        if isinstance(file, str):
+            self._fp = open(file, 'wb')
+            self._own_fp = True
+        else:
+            self._fp = file
+            self._own_fp = False
+        self._offset = 0
+        self._entries = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def _write(self, b: bytes):
+        self._fp.write(b)
+        self._offset += len(b)
+
+    def _write_entry(self, name: str, raw: bytes, compress_type: int, crc: int, file_size: int,
+                     date_time: tuple, flag_bits: int = 0):
+        name_bytes = name.encode('utf-8')
+        flag_bits = (flag_bits & ~_FLAG_DATA_DESCRIPTOR) | (0 if name.isascii() else _FLAG_UTF8)
+        dos_time = (date_time[3] << 11) | (date_time[4] << 5) | (date_time[5] // 2)
+        dos_date = ((date_time[0] - 1980) << 9) | (date_time[1] << 5) | date_time[2]
+        version = 20 if compress_type == ZIP_DEFLATED else 10
+
+        header_offset = self._offset
+        self._write(_LOCAL_HEADER.pack(_LOCAL_HEADER_SIGNATURE, version, 0, flag_bits, compress_type, dos_time,
+                                       dos_date, crc, len(raw), file_size, len(name_bytes), 0))
+        self._write(name_bytes)
+        self._write(raw)
+        self._entries.append((name_bytes, version, flag_bits, compress_type, dos_time, dos_date, crc, len(raw),
+                              file_size, header_offset))
+
+    def write_raw(self, info: ZipInfo, raw: bytes):
+        """
+        原样写入已压缩的条目
+
+        :param info: 源条目信息，提供文件名、压缩方式、crc 与大小
+        :param raw: 源条目压缩后的字节，见 read_raw_entry
+        """
+        self._write_entry(info.filename, raw, info.compress_type, info.CRC, info.file_size, info.date_time,
+                          info.flag_bits)
+
+    def writestr(self, name: str, data: bytes, compress_type: int = ZIP_DEFLATED, compress_level: int = -1,
+                 date_time: tuple = None):
+        """
+        压缩并写入条目
+
+        :param name: 条目名称
+        :param data: 未压缩的内容
+        :param compress_type: 压缩方式，ZIP_DEFLATED 或 ZIP_STORED
+        :param compress_level: deflate 压缩级别，-1 为 zlib 默认级别
+        :param date_time: 修改时间 (年, 月, 日, 时, 分, 秒)，默认为当前时间
+        """
+        if date_time is None:
+            date_time = time.localtime()[:6]
+        if compress_type == ZIP_STORED:
+            raw = data
+        else:
+            compressor = zlib.compressobj(compress_level, zlib.DEFLATED, -15)
+            raw = compressor.compress(data) + compressor.flush()
+        self._write_entry(name, raw, compress_type, zlib.crc32(data), len(data), date_time)
+
+    @property
+    def size(self) -> int:
+        """已写入的字节数"""
+        return self._offset
+
+    def close(self):
+        """写入中央目录，若输出为文件路径则关闭文件"""
+        if self._fp is None:
+            return
+        cd_offset = self._offset
+        for name_bytes, version, flag_bits, compress_type, dos_time, dos_date, crc, compress_size, file_size, \
+                header_offset in self._entries:
+            self._write(_CENTRAL_HEADER.pack(_CENTRAL_HEADER_SIGNATURE, version, 0, version, 0, flag_bits,
+                                             compress_type, dos_time, dos_date, crc, compress_size, file_size,
+                                             len(name_bytes), 0, 0, 0, 0, 0, header_offset))
+            self._write(name_bytes)
+        cd_size = self._offset - cd_offset
+        self._write(_END_RECORD.pack(_END_RECORD_SIGNATURE, 0, 0, len(self._entries), len(self._entries), cd_size,
+                                     cd_offset, 0))
+        if self._own_fp:
+            self._fp.close()
+        self._fp = None
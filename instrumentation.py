@@ -0,0 +1,317 @@
+import heapq
+import json
+import os
+import threading
+import time
+from abc import ABCMeta, abstractmethod
+from collections import defaultdict
+from contextlib import contextmanager
+
+
+def summarize(times: list[float]) -> dict:
+    """统计耗时列表（秒）：次数、总计、平均、最小、中位数、p99 与最大值"""
+    if not times:
+        return {'count': 0}
+    s = sorted(times)
+    return {'count': len(s), 'total': sum(s), 'mean': sum(s) / len(s), 'min': s[0],
+            'p50': s[len(s) // 2], 'p99': s[min(len(s) - 1, int(len(s) * 0.99))], 'max': s[-1]}
+
+
+class EventSink(metaclass=ABCMeta):
+    """
+    计时事件接收器
+
+    事件为字典，包含 stage:阶段名称、duration:耗时（秒），以及可选的 index:数据序号、label_type:标签类型、label_name:标签名称、
+    size:字节数 等字段。阶段包括：
+    load:读取并解析模板文件、scan:扫描模板中的内容标签、compile:编译模板（含 load 与 scan）、
+    no_content:插入一个无内容标签、label:插入一个有内容标签、data_type_error:数据与标签类型不匹配（耗时为 0）、
+    save:保存文档、document:生成一份文档的总耗时
+    """
+
+    @abstractmethod
+    def emit(self, event: dict):
+        """接收一个事件"""
+        pass
+
+    def close(self):
+        pass
+
+
+class LoggingSink(EventSink):
+    """将事件写入日志"""
+
+    def __init__(self, logger=None, level: int = None):
+        """
+        :param logger: logging.Logger，默认为名为 template_docx 的日志记录器
+        :param level: 日志级别，默认为 logging.DEBUG
+        """
+        # logging 只在使用日志接收器时导入
+        import logging
+        self.logger = logger or logging.getLogger('template_docx')
+        self.level = logging.DEBUG if level is None else level
+
+    def emit(self, event: dict):
+        if self.logger.isEnabledFor(self.level):
+            fields = ' '.join(f'{k}={v}' for k, v in event.items() if k not in ('stage', 'duration'))
+            self.logger.log(self.level, '%s %.6fs %s', event['stage'], event['duration'], fields)
+
+
+class AggregateSink(EventSink):
+    """
+    在内存中按 (阶段, 标签类型) 聚合事件的耗时、字节数与内存，不保存单个事件
+
+    包含内存统计的事件（见 Instrumentation 的 memory 参数）额外按 memory_peak 与 rss_growth 中的较大值保留每个阶段内存占用最大的 top 个事件，
+    用于找出占用内存最多的数据
+    """
+
+    def __init__(self, top: int = 10):
+        """
+        :param top: 每个阶段保留的内存峰值最大的事件数
+        """
+        self.top = top
+        self._times = defaultdict(list)
+        self._sizes = defaultdict(int)
+        self._memory_peaks = defaultdict(list)
+        self._rss_max = defaultdict(int)
+        self._rss_growths = defaultdict(list)
+        # 阶段 -> 以 (内存占用, 序号, 事件) 为元素的小顶堆
+        self._top_events = defaultdict(list)
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def emit(self, event: dict):
+        key = (event['stage'], event.get('label_type'))
+        with self._lock:
+            self._times[key].append(event['duration'])
+            if event.get('size') is not None:
+                self._sizes[key] += event['size']
+            memory_peak = event.get('memory_peak')
+            if memory_peak is not None:
+                self._memory_peaks[key].append(memory_peak)
+                if event.get('rss') is not None:
+                    self._rss_max[key] = max(self._rss_max[key], event['rss'])
+                rss_growth = event.get('rss_growth')
+                if rss_growth is not None:
+                    self._rss_growths[key].append(rss_growth)
+                self._count += 1
+                top_events = self._top_events[event['stage']]
+                item = (max(memory_peak, rss_growth or 0), self._count, event)
+                if len(top_events) < self.top:
+                    heapq.heappush(top_events, item)
+                elif item[0] > top_events[0][0]:
+                    heapq.heapreplace(top_events, item)
+
+    def summary(self) -> dict:
+        """
+        :return: 以 '阶段' 或 '阶段:标签类型' 为键的统计字典，见 summarize，包含 size 事件时还有 size:字节数总计，
+                 包含内存统计时还有 memory:memory_peak 的统计（字节，见 summarize）、rss_growth:rss_growth 的统计
+                 与 rss_max:阶段结束时的最大常驻内存（字节）
+        """
+        with self._lock:
+            result = {}
+            for (stage, label_type), times in sorted(self._times.items(), key=lambda item: (item[0][0], item[0][1] or '')):
+                key = (stage, label_type)
+                stat = summarize(times)
+                if key in self._sizes:
+                    stat['size'] = self._sizes[key]
+                if key in self._memory_peaks:
+                    stat['memory'] = summarize(self._memory_peaks[key])
+                    stat['rss_growth'] = summarize(self._rss_growths.get(key, []))
+                    stat['rss_max'] = self._rss_max.get(key)
+                result[stage if label_type is None else f'{stage}:{label_type}'] = stat
+            return result
+
+    def top_memory_events(self) -> dict:
+        """:return: 阶段 -> 按内存占用从大到小排列的事件列表"""
+        with self._lock:
+            return {stage: [event for _, _, event in sorted(items, reverse=True)]
+                    for stage, items in sorted(self._top_events.items())}
+
+    def print_summary(self):
+        summary = self.summary()
+        with_memory = any('memory' in stat for stat in summary.values())
+        print(f"{'阶段':<28}{'次数':>8}{'p50':>12}{'p99':>12}{'总计':>12}"
+              + (f"{'内存p50':>12}{'内存p99':>12}{'内存最大':>12}{'RSS增长最大':>12}" if with_memory else ''))
+        for name, stat in summary.items():
+            line = (f"{name:<28}{stat['count']:>8}{stat['p50'] * 1000:>10.3f}ms{stat['p99'] * 1000:>10.3f}ms"
+                    f"{stat['total']:>11.3f}s")
+            if 'memory' in stat:
+                memory = stat['memory']
+                line += ''.join(f"{memory[k] / 1024 / 1024:>10.2f}MB" for k in ('p50', 'p99', 'max'))
+                line += f"{stat['rss_growth'].get('max', 0) / 1024 / 1024:>10.2f}MB"
+            print(line)
+
+    def write_report(self, report_path: str):
+        """将统计结果与内存峰值最大的事件写入 JSON 报告"""
+        with open(report_path, 'w', encoding='utf-8') as f:
+            json.dump({'summary': self.summary(), 'top_memory_events': self.top_memory_events()},
+                      f, ensure_ascii=False, indent=2, default=str)
+
+
+class JsonLinesSink(EventSink):
+    """将每个事件作为一行 JSON 写入文件"""
+
+    def __init__(self, file):
+        """
+        :param file: 文件路径（追加写入）或可写的文本文件对象
+        """
+        if isinstance(file, str):
+            self._fp = open(file, 'a', encoding='utf-8')
+            self._own_fp = True
+        else:
+            self._fp = file
+            self._own_fp = False
+        self._lock = threading.Lock()
+
+    def emit(self, event: dict):
+        line = json.dumps(event, ensure_ascii=False, default=str) + '\n'
+        with self._lock:
+            self._fp.write(line)
+
+    def close(self):
+        if self._own_fp:
+            self._fp.close()
+        else:
+            self._fp.flush()
+
+
+class BufferSink(EventSink):
+    """将事件保存在列表中，如工作进程缓存事件后交由主进程转发"""
+
+    def __init__(self):
+        self.events = []
+
+    def emit(self, event: dict):
+        self.events.append(event)
+
+
+try:
+    _page_size = os.sysconf('SC_PAGE_SIZE')
+except (AttributeError, ValueError, OSError):
+    _page_size = 4096
+
+
+def _current_rss() -> [int, None]:
+    """当前进程的常驻内存（字节），仅支持 Linux（/proc），其他平台返回 None"""
+    try:
+        with open('/proc/self/statm', 'rb') as f:
+            return int(f.read().split()[1]) * _page_size
+    except (OSError, IndexError, ValueError):
+        return None
+
+
+class Instrumentation:
+    """
+    计时埋点，将事件分发给所有接收器
+
+    未启用计时时各处的 instrumentation 为 None，不产生额外开销。
+    启用内存统计（memory=True）时使用 tracemalloc 跟踪 Python 对象的内存分配（lxml 树的内存由 libxml2 分配，不被跟踪，只体现在 RSS 中），
+    每个由 begin/end 包围的阶段事件增加字段 memory_peak:阶段内 Python 内存分配峰值相对阶段开始时的增量（字节）、
+    rss:阶段结束时进程的常驻内存（字节）、rss_growth:阶段内常驻内存的增长（字节，可反映 lxml 树等非 Python 对象的内存）、pid:进程 id。
+    嵌套阶段（如文档内的各个标签）的峰值会计入外层阶段。
+    tracemalloc 会使生成速度明显变慢，只应在排查内存问题时开启
+
+    多个线程可以共用同一个 Instrumentation（接收器是线程安全的），数据序号 index 与未结束阶段的栈按线程分别保存；
+    内存统计是进程级的，多线程同时生成时各阶段的内存字段会包含其他线程的内存分配
+    """
+
+    def __init__(self, *sinks: EventSink, memory: bool = False):
+        """
+        :param sinks: 事件接收器
+        :param memory: 是否统计内存，见类说明
+        """
+        self.sinks = list(sinks)
+        self.memory = memory
+        self._started_tracemalloc = False
+        self._tracemalloc = None
+        if memory:
+            import tracemalloc
+            self._tracemalloc = tracemalloc
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self._started_tracemalloc = True
+        # 每个线程的数据序号 index 与未结束阶段的栈 stages
+        self._local = threading.local()
+
+    @property
+    def index(self) -> [int, None]:
+        """当前线程生成的数据序号，不为 None 时加入每个事件"""
+        return getattr(self._local, 'index', None)
+
+    @index.setter
+    def index(self, index: [int, None]):
+        self._local.index = index
+
+    def _get_stages(self) -> list:
+        """当前线程未结束阶段的栈，元素为 [开始时间, 开始时的已分配内存, 子阶段的内存峰值, 开始时的常驻内存]"""
+        stages = getattr(self._local, 'stages', None)
+        if stages is None:
+            stages = self._local.stages = []
+        return stages
+
+    def emit(self, stage: str, duration: float, **fields):
+        event = {'stage': stage, 'duration': duration}
+        index = self.index
+        if index is not None:
+            event['index'] = index
+        event.update(fields)
+        self.forward(event)
+
+    def forward(self, event: dict):
+        """原样分发已生成的事件"""
+        for sink in self.sinks:
+            sink.emit(event)
+
+    def begin(self):
+        """开始一个阶段，必须在同一线程内与 end 成对调用"""
+        stages = self._get_stages()
+        if self.memory:
+            current, peak = self._tracemalloc.get_traced_memory()
+            if stages:
+                # 重置峰值前将其计入外层阶段
+                stages[-1][2] = max(stages[-1][2], peak)
+            self._tracemalloc.reset_peak()
+            stages.append([time.perf_counter(), current, current, _current_rss()])
+        else:
+            stages.append([time.perf_counter(), 0, 0, None])
+
+    def end(self, stage: str, **fields):
+        """结束当前线程最近开始的阶段并发出事件，返回阶段耗时（秒）"""
+        stages = self._get_stages()
+        start, start_memory, child_peak, start_rss = stages.pop()
+        duration = time.perf_counter() - start
+        if self.memory:
+            peak = max(self._tracemalloc.get_traced_memory()[1], child_peak)
+            if stages:
+                stages[-1][2] = max(stages[-1][2], peak)
+            rss = _current_rss()
+            fields.update(memory_peak=peak - start_memory, rss=rss,
+                          rss_growth=None if rss is None or start_rss is None else rss - start_rss, pid=os.getpid())
+        self.emit(stage, duration, **fields)
+        return duration
+
+    @contextmanager
+    def timer(self, stage: str, **fields):
+        """计时上下文，退出时发出事件，可在上下文内向 fields 添加字段（如 size）"""
+        self.begin()
+        try:
+            yield fields
+        finally:
+            self.end(stage, **fields)
+
+    def close(self):
+        for sink in self.sinks:
+            sink.close()
+        if self._started_tracemalloc:
+            self._tracemalloc.stop()
+            self._started_tracemalloc = False
+
+
+@contextmanager
+def optional_timer(instrumentation: Instrumentation, stage: str, **fields):
+    """instrumentation 为 None 时不计时"""
+    if instrumentation is None:
+        yield fields
+    else:
+        with instrumentation.timer(stage, **fields) as timer_fields:
+            yield timer_fields
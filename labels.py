@@ -1,16 +1,29 @@
 import time
 from abc import ABCMeta, abstractmethod
-from typing import Any, List
+from typing import Any, List, Mapping
 
 from docx.enum.text import WD_PARAGRAPH_ALIGNMENT
 from docx.oxml import CT_Tbl
-from docx.table import Table
 
-from helper import image_size
+from helper.image_cache import image_cache, image_variant_cache
+from helper.table_helper import format_column, is_ndarray
 from helper.docx_helper import *
 from helper.type_helper import *
 
 
+# 静态数据中当前时间戳的键，由渲染上下文在标签注册静态数据前写入，用于注入时钟；不存在时使用系统时间
+STATIC_NOW_KEY = '_now'
+
+
+def get_static_now(static_datas: dict) -> float:
+    now_time = static_datas.get(STATIC_NOW_KEY)
+    return time.time() if now_time is None else now_time
+
+
+# 静态数据中图片目标分辨率（每英寸像素数）的键，由渲染上下文写入；存在时图片按显示尺寸缩小到该分辨率并重新压缩后嵌入
+STATIC_IMAGE_DPI_KEY = '_image_dpi'
+
+
 class Label(metaclass=ABCMeta):
     """
     内容标签接口
@@ -46,6 +59,16 @@ class Label(metaclass=ABCMeta):
         """检查插入输入类型"""
         pass
 
+    @classmethod
+    def get_data_shape(cls) -> [str, None]:
+        """插入内容的数据格式说明，用于导出模板的数据格式，无内容标签返回 None"""
+        return None
+
+    @classmethod
+    def get_data_files(cls, data: Any) -> list:
+        """插入内容引用的本地文件路径列表，文件被修改后生成结果随之变化，用于断点清单与生成结果缓存判断数据是否变化"""
+        return []
+
 
 class NoContentLabel(Label, metaclass=ABCMeta):
     @classmethod
@@ -68,7 +91,19 @@ class ContentLabel(Label, metaclass=ABCMeta):
 
 
 class LabelManager:
+    """
+    内容标签注册表
+
+    内置标签在本模块中注册。第三方标签通过入口点（entry point）发布，组名为 entry_point_group，入口点名称为标签类型，值指向 Label 子类，
+    例如在第三方包的 pyproject.toml 中声明：
+        [project.entry-points."template_docx.labels"]
+        qrcode = "my_labels:QrCodeLabel"
+    第三方标签不会在导入时加载，只有模板中出现未注册的类型时才通过 find_label 加载对应的入口点
+    """
     __labels = []
+    entry_point_group = 'template_docx.labels'
+    # 标签类型 -> 未加载的入口点，首次查找未注册的类型时读取
+    __entry_points = None
 
     @classmethod
     def register(cls, label):
@@ -80,6 +115,22 @@ class LabelManager:
     def get_labels(cls) -> List[Label]:
         return cls.__labels.copy()
 
+    @classmethod
+    def find_label(cls, label_type: str) -> [Label, None]:
+        """查找标签类型对应的标签，未注册时尝试加载同名入口点并注册，不存在时返回 None"""
+        for label in cls.__labels:
+            if label.get_type() == label_type:
+                return label
+        if cls.__entry_points is None:
+            from importlib.metadata import entry_points
+            cls.__entry_points = {ep.name: ep for ep in entry_points(group=cls.entry_point_group)}
+        entry_point = cls.__entry_points.pop(label_type, None)
+        if entry_point is None:
+            return None
+        label = entry_point.load()
+        cls.register(label)
+        return label
+
     @classmethod
     def print_registered_labels(cls):
         print(f'当前注册的内容标签类型有：{[l.get_type() for l in cls.__labels]}')
@@ -103,6 +154,10 @@ class TextLabel(ContentLabel):
     def check_data_type(cls, data: Any) -> bool:
         return isinstance(data, str)
 
+    @classmethod
+    def get_data_shape(cls) -> [str, None]:
+        return 'str'
+
 
 LabelManager.register(TextLabel)
 
@@ -114,7 +169,7 @@ class DateLabel(NoContentLabel):
 
     @classmethod
     def register_static_datas(cls, static_datas: dict) -> None:
-        now_time = time.time()
+        now_time = get_static_now(static_datas)
         now_time_struct = time.localtime(now_time)
         date_s = time.strftime("%Y-%m-%d", now_time_struct)
         static_datas[cls.get_type()] = date_s
@@ -135,7 +190,7 @@ class TimeLabel(NoContentLabel):
 
     @classmethod
     def register_static_datas(cls, static_datas: dict) -> None:
-        now_time = time.time()
+        now_time = get_static_now(static_datas)
         now_time_struct = time.localtime(now_time)
         time_s = time.strftime("%H:%M:%S", now_time_struct)
         static_datas[cls.get_type()] = time_s
@@ -157,9 +212,7 @@ class OrderedListLabel(ContentLabel):
     @classmethod
     def insert_data_to_point(cls, point_data: dict, data: Any, static_datas: dict) -> None:
         paragraph = point_data['paragraph']
-        for i, item in enumerate(data):
-            p = paragraph.insert_paragraph_before(f'{i + 1}. {item}')
-            copy_paragraph_style(p, paragraph)
+        insert_paragraphs_before(paragraph, (f'{i + 1}. {item}' for i, item in enumerate(data)), point_data['run'])
         delete_paragraph(paragraph)
 
     @classmethod
@@ -167,6 +220,10 @@ class OrderedListLabel(ContentLabel):
         """要求data是list，且元素是str"""
         return isinstance(data, Iterable) and all([isinstance(d, str) for d in data])
 
+    @classmethod
+    def get_data_shape(cls) -> [str, None]:
+        return 'Iterable[str]'
+
 
 LabelManager.register(OrderedListLabel)
 
@@ -184,9 +241,8 @@ class UnorderedListLabel(ContentLabel):
     @classmethod
     def insert_data_to_point(cls, point_data: dict, data: Any, static_datas: dict) -> None:
         paragraph = point_data['paragraph']
-        for i, item in enumerate(data):
-            p = paragraph.insert_paragraph_before(f'{cls._header_chars[cls._default_header_char]}{" " * cls._default_header_gap}{item}')
-            copy_paragraph_style(p, paragraph)
+        header = f'{cls._header_chars[cls._default_header_char]}{" " * cls._default_header_gap}'
+        insert_paragraphs_before(paragraph, (f'{header}{item}' for item in data), point_data['run'])
         delete_paragraph(paragraph)
 
     @classmethod
@@ -194,6 +250,10 @@ class UnorderedListLabel(ContentLabel):
         """要求data是list，且元素是str"""
         return isinstance(data, Iterable) and all([isinstance(d, str) for d in data])
 
+    @classmethod
+    def get_data_shape(cls) -> [str, None]:
+        return 'Iterable[str]'
+
 
 LabelManager.register(UnorderedListLabel)
 
@@ -218,18 +278,27 @@ class ImageLabel(ContentLabel):
         l_margin, r_margin, t_margin, b_margin = d_section.left_margin, d_section.right_margin, d_section.top_margin, d_section.bottom_margin
         max_height = doc_height - t_margin - b_margin
         max_width = doc_width - l_margin - r_margin
-        img_width, img_height = image_size.get(pic_url)
+        image = image_cache.get(pic_url)
+        img_width, img_height = image.px_width, image.px_height
 
         limit_doc_width = True
         if doc_width / doc_height > img_width / img_height:
             limit_doc_width = False
 
+        image_dpi = static_datas.get(STATIC_IMAGE_DPI_KEY)
+        if image_dpi:
+            if limit_doc_width:
+                display_width, display_height = max_width, int(max_width * img_height / img_width)
+            else:
+                display_width, display_height = int(max_height * img_width / img_height), max_height
+            image = image_variant_cache.get(image, display_width, display_height, image_dpi)
+
         ip = paragraph.insert_paragraph_before()
         ir = ip.add_run()
         if limit_doc_width:
-            ir.add_picture(pic_url, width=max_width)
+            add_picture_from_image(ir, image, width=max_width)
         else:
-            ir.add_picture(pic_url, height=max_height)
+            add_picture_from_image(ir, image, height=max_height)
 
         if pic_desc is None:
             delete_paragraph(paragraph)
@@ -239,8 +308,16 @@ class ImageLabel(ContentLabel):
 
     @classmethod
     def check_data_type(cls, data: Any) -> bool:
-        """要求data为tuple，第一个元素是描述字符串，第二个元素是图片url"""
-        return isinstance(data, tuple) and len(data) == 2 and (isinstance(data[0], str) or data[0] is None) and isinstance(data[1], str)
+        """要求data为tuple（从 JSON 加载的数据也可以是 list），第一个元素是描述字符串，第二个元素是图片url"""
+        return isinstance(data, (tuple, list)) and len(data) == 2 and (isinstance(data[0], str) or data[0] is None) and isinstance(data[1], str)
+
+    @classmethod
+    def get_data_shape(cls) -> [str, None]:
+        return 'Tuple[str | None, str]'
+
+    @classmethod
+    def get_data_files(cls, data: Any) -> list:
+        return [data[1]] if cls.check_data_type(data) else []
 
 
 LabelManager.register(ImageLabel)
@@ -255,46 +332,124 @@ class LinkLabel(ContentLabel):
     def insert_data_to_point(cls, point_data: dict, data: Any, static_datas: dict) -> None:
         """将包含标签的 run 替换为 link"""
         link_n, link_url = data
-        paragraph = point_data['paragraph']
-        run_index = point_data['run_index']
-        set_hyperlink(run_index, paragraph, link_n, link_url)
+        set_run_hyperlink(point_data['run'], link_n, link_url)
 
     @classmethod
     def check_data_type(cls, data: Any) -> bool:
-        """要求data是tuple，第一个元素是链接名称，第二个元素是链接url"""
-        return isinstance(data, tuple) and len(data) == 2 and isinstance(data[0], str) and isinstance(data[1], str)
+        """要求data是tuple（从 JSON 加载的数据也可以是 list），第一个元素是链接名称，第二个元素是链接url"""
+        return isinstance(data, (tuple, list)) and len(data) == 2 and isinstance(data[0], str) and isinstance(data[1], str)
+
+    @classmethod
+    def get_data_shape(cls) -> [str, None]:
+        return 'Tuple[str, str]'
 
 
 LabelManager.register(LinkLabel)
 
 
+class TableRows:
+    """
+    流式表格数据，包装惰性的行迭代器（生成器、数据库游标、csv.reader 等），插入时逐行校验并写入，不需要将整个表格加载到内存
+
+    每行为 Iterable[str]，列数由表头决定
+    """
+
+    def __init__(self, rows: Iterable, header: List[str] = None):
+        """
+        :param rows: 行迭代器
+        :param header: 表头，为 None 时使用 rows 的第一行作为表头
+        """
+        self.rows = rows
+        self.header = header
+
+
+class TableColumns:
+    """
+    列式表格数据，支持列名到列数组的字典或 NumPy 二维数组，插入时按列批量格式化为字符串
+
+    首行为表头（列名），首列为列头
+    """
+
+    def __init__(self, columns, header: List[str] = None, formats: dict = None):
+        """
+        :param columns: 列名到列数据（序列或一维 NumPy 数组）的字典，或 NumPy 二维数组（每列为一列数据）
+        :param header: 表头，columns 为字典时默认使用字典的键，为二维数组时必须指定
+        :param formats: 列名到格式说明的字典，格式说明见 helper.table_helper.format_column，未指定的列直接转换为字符串
+        """
+        self.columns = columns
+        self.header = header
+        self.formats = formats or {}
+
+    def get_header(self) -> [List[str], None]:
+        if self.header is not None:
+            return list(self.header)
+        if isinstance(self.columns, Mapping):
+            return [str(k) for k in self.columns.keys()]
+        return None
+
+    def get_columns(self) -> list:
+        if isinstance(self.columns, Mapping):
+            return list(self.columns.values())
+        return [self.columns[:, i] for i in range(self.columns.shape[1])]
+
+    def check(self) -> bool:
+        """检查表头与列数、各列长度是否一致"""
+        header = self.get_header()
+        if not header or not check_iterable_type(header, str):
+            return False
+        if isinstance(self.columns, Mapping):
+            columns = self.get_columns()
+            return len(columns) == len(header) and len(set(len(c) for c in columns)) <= 1
+        return is_ndarray(self.columns) and self.columns.ndim == 2 and self.columns.shape[1] == len(header)
+
+    def to_table_rows(self) -> TableRows:
+        """按列批量格式化，返回逐行生成的流式表格数据"""
+        header = self.get_header()
+        formatted = [format_column(column, self.formats.get(name)) for name, column in zip(header, self.get_columns())]
+        return TableRows(zip(*formatted), header)
+
+
 class TableLabel(ContentLabel):
     @classmethod
     def get_type(cls) -> str:
         return 'table'
 
+    @classmethod
+    def _iter_checked_rows(cls, header: List[str], rows: Iterator):
+        """依次校验并生成表头与每一行，行数据类型或列数不符时抛出 TypeError"""
+        yield header
+        for row_index, row in enumerate(rows, 1):
+            row = row if isinstance(row, (list, tuple)) else list(row)
+            if len(row) != len(header) or not check_iterable_type(row, str):
+                raise TypeError(f"表格第 {row_index} 行数据 {row} 不是 {len(header)} 列的字符串")
+            yield row
+
     @classmethod
     def insert_data_to_point(cls, point_data: dict, data: Any, static_datas: dict) -> None:
         """在内容标签的 paragraph 下插入表格，并删除内容标签的 paragraph"""
         document = point_data['document']
         paragraph = point_data['paragraph']
-        document_body = document._body
 
-        tbl = CT_Tbl.new_tbl(0, len(data[0]), document._block_width)
+        if isinstance(data, Mapping):
+            data = TableColumns(data)
+        if isinstance(data, TableColumns):
+            data = data.to_table_rows()
+        if isinstance(data, TableRows):
+            header, rows = data.header, iter(data.rows)
+        else:
+            header, rows = None, iter(data)
+        if header is None:
+            header = next(rows, None)
+        if header is not None:
+            header = list(header)
+        if not header or not check_iterable_type(header, str):
+            raise TypeError(f"表格表头 {header} 为空或不是字符串列表")
+
+        tbl = CT_Tbl.new_tbl(0, len(header), document._block_width)
         paragraph._element.addnext(tbl)
-        table = Table(tbl, document_body)
-
-        for row in data:
-            for i, cell in enumerate(table.add_row().cells):
-                cell.text = row[i]
 
-        # 设置表头、列头样式
-        for cell in table.row_cells(0):
-            for r in cell.paragraphs[0].runs:
-                r.bold = True
-        for cell in table.column_cells(0):
-            for r in cell.paragraphs[0].runs:
-                r.bold = True
+        # 逐行校验并批量构建表格行，同时设置表头、列头加粗
+        append_table_rows(tbl, cls._iter_checked_rows(header, rows))
 
         delete_paragraph(paragraph)
 
@@ -302,8 +457,23 @@ class TableLabel(ContentLabel):
     def check_data_type(cls, data: Any) -> bool:
         """
         要求表格数据为二维矩阵 Iterable[Iterable[str]]，默认首行为表头，首列为列头，行/列数都不可为0
+
+        也可以是惰性的行迭代器或 TableRows，此时只检查表头，每行数据在插入时校验；
+        或者是列式数据 TableColumns 或列名到列数据的字典，此时检查表头与各列长度
         """
+        if isinstance(data, Mapping):
+            data = TableColumns(data)
+        if isinstance(data, TableColumns):
+            return data.check()
+        if isinstance(data, TableRows):
+            return data.header is None or (check_iterable_type(data.header, str) and len(data.header) > 0)
+        if isinstance(data, Iterator):
+            return True
         return isinstance(data, Iterable) and all(check_iterable_type(i, str) for i in data) and len(data) > 0 and len(data[0]) > 0
 
+    @classmethod
+    def get_data_shape(cls) -> [str, None]:
+        return 'Iterable[Iterable[str]] | Iterator[Iterable[str]] | TableRows | TableColumns | Dict[str, Sequence]'
+
 
 LabelManager.register(TableLabel)
@@ -0,0 +1,211 @@
+import re
+import time
+
+from docx.opc.constants import RELATIONSHIP_TYPE
+from docx.opc.packuri import PackURI
+from docx.oxml import OxmlElement
+from docx.oxml.ns import nsmap, qn
+from docx.parts.image import ImagePart
+
+from batch_renderer import RenderCode, RenderOptions
+from compiled_template import template_cache
+from data_loader import DataLoader
+from doc_processor import DocumentProcessor
+from helper.docx_helper import HyperlinkRelationships
+from instrumentation import Instrumentation, optional_timer
+from output_sink import OutputSink, FileSink
+from template_analyzer import TemplateAnalyzer, RenderContext
+
+_r_attr_prefix = '{%s}' % nsmap['r']
+
+
+class DocumentMerger:
+    """
+    将多份由同一编译模板生成的文档依次合并到第一份文档的正文末尾
+
+    追加的正文元素直接移动到合并文档中，并重新映射其中引用的关系 id：外部关系（超链接）按目标合并，
+    图片按内容去重，模板中未被修改的其他部件映射到合并文档中的同名部件。
+    所有查找都使用索引，追加一份文档的耗时只与该文档的大小有关，合并 n 份文档的总耗时为线性。
+
+    页眉、页脚与节属性使用第一份文档的；有序列表的编号在各份文档之间连续
+    """
+
+    def __init__(self, document):
+        """
+        :param document: 合并文档，即第一份生成的文档，后续文档追加到其正文末尾
+        """
+        self.document = document
+        self._part = document.part
+        self._body = document.element.body
+        # body.sectPr 每次都要遍历正文的所有子元素，只查找一次
+        self._sect_pr = self._body.sectPr
+        self._package = self._part.package
+        self._rels = self._part.rels
+        # (关系类型, 目标部件) -> rId，外部关系中超链接由 HyperlinkRelationships 索引
+        self._internal_r_ids = {(rel.reltype, rel.target_part): r_id for r_id, rel in self._rels.items()
+                                if not rel.is_external}
+        self._external_r_ids = {(rel.reltype, rel.target_ref): r_id for r_id, rel in self._rels.items()
+                                if rel.is_external}
+        self._next_r_id = len(self._rels) + 1
+        self._parts = {part.partname: part for part in self._package.iter_parts()}
+        # 图片内容 -> 图片部件，各文档中来自模板的图片是同一个 bytes 对象，其哈希只计算一次
+        self._image_parts = {part.blob: part for part in self._package.image_parts}
+        self._next_image_index = 1
+        self._next_doc_pr_id = self._part.next_id
+
+    def _add_relationship(self, reltype: str, target, is_external: bool) -> str:
+        # 与其他代码添加的关系一样，跳过已被占用的 id
+        while f'rId{self._next_r_id}' in self._rels:
+            self._next_r_id += 1
+        r_id = f'rId{self._next_r_id}'
+        self._rels.add_relationship(reltype, target, r_id, is_external)
+        return r_id
+
+    def _add_image_part(self, image_part) -> ImagePart:
+        ext = image_part.partname.ext
+        while (partname := PackURI(f'/word/media/image{self._next_image_index}.{ext}')) in self._parts:
+            self._next_image_index += 1
+        part = ImagePart(partname, image_part.content_type, image_part.blob)
+        self._parts[partname] = part
+        self._image_parts[part.blob] = part
+        self._package.image_parts.append(part)
+        return part
+
+    def _add_part(self, target_part):
+        # 标签只会新增图片部件，其他部件都来自模板，一般不会走到这里
+        template = re.sub(r'\d*(\.\w+)$', r'%d\1', str(target_part.partname))
+        target_part.partname = self._package.next_partname(template)
+        self._parts[target_part.partname] = target_part
+        return target_part
+
+    def _map_part(self, target_part):
+        if isinstance(target_part, ImagePart):
+            part = self._image_parts.get(target_part.blob)
+            return part if part is not None else self._add_image_part(target_part)
+        part = self._parts.get(target_part.partname)
+        return part if part is not None else self._add_part(target_part)
+
+    def _map_r_id(self, rels, r_id: str) -> str:
+        rel = rels[r_id]
+        if rel.is_external:
+            if rel.reltype == RELATIONSHIP_TYPE.HYPERLINK:
+                return HyperlinkRelationships.of(self._part).get_or_add(rel.target_ref)
+            key = (rel.reltype, rel.target_ref)
+            new_r_id = self._external_r_ids.get(key)
+            if new_r_id is None:
+                new_r_id = self._external_r_ids[key] = self._add_relationship(rel.reltype, rel.target_ref, True)
+            return new_r_id
+        key = (rel.reltype, self._map_part(rel.target_part))
+        new_r_id = self._internal_r_ids.get(key)
+        if new_r_id is None:
+            new_r_id = self._internal_r_ids[key] = self._add_relationship(key[0], key[1], False)
+        return new_r_id
+
+    def _add_page_break(self):
+        p, r, br = OxmlElement('w:p'), OxmlElement('w:r'), OxmlElement('w:br')
+        br.set(qn('w:type'), 'page')
+        r.append(br)
+        p.append(r)
+        self._append_to_body(p)
+
+    def _append_to_body(self, element):
+        if self._sect_pr is not None:
+            self._sect_pr.addprevious(element)
+        else:
+            self._body.append(element)
+
+    def append(self, document, page_break: bool = True):
+        """
+        将文档正文追加到合并文档末尾，追加后 document 的正文被清空，不能再使用
+
+        :param document: 由同一编译模板生成的文档
+        :param page_break: 是否在追加的正文前插入分页符
+        """
+        rels = document.part.rels
+        r_id_map = {}
+        doc_pr_tag = qn('wp:docPr')
+        children = [child for child in document.element.body if child.tag != qn('w:sectPr')]
+        # 先完成所有映射再移动元素，映射失败时不会向合并文档写入不完整的内容
+        for child in children:
+            for el in child.iter():
+                if el.tag == doc_pr_tag:
+                    # 图片等绘图对象的 id 需要在整个文档内唯一
+                    el.set('id', str(self._next_doc_pr_id))
+                    self._next_doc_pr_id += 1
+                for name, value in el.attrib.items():
+                    if name.startswith(_r_attr_prefix):
+                        new_r_id = r_id_map.get(value)
+                        if new_r_id is None:
+                            new_r_id = r_id_map[value] = self._map_r_id(rels, value)
+                        el.set(name, new_r_id)
+        if page_break:
+            self._add_page_break()
+        for child in children:
+            self._append_to_body(child)
+
+
+def merge_batch(file_path: str, data_loader: DataLoader, save_path: str, context: RenderContext = None,
+                options: RenderOptions = None, sink: OutputSink = None, page_break: bool = True,
+                instrumentation: Instrumentation = None) -> dict:
+    """
+    邮件合并：依次使用每组数据生成文档，并合并为一份文档，见 DocumentMerger
+
+    :param file_path: 模板文件路径
+    :param data_loader: 数据加载器
+    :param save_path: 合并文档的输出路径（输出目标中的名称）
+    :param context: 渲染上下文，默认根据 options 新建
+    :param options: 生成选项，见 RenderOptions，不使用生成结果缓存
+    :param sink: 输出目标，见 render_batch
+    :param page_break: 是否在每组数据的内容之间插入分页符
+    :param instrumentation: 计时埋点，见 render_batch
+
+    :return: 模板校验失败时打印校验信息并返回 None；否则返回字典，包含 save_path:输出路径、size:写入的字节数、save_time:保存耗时（秒）、
+             results:每组数据的生成结果列表，格式与 render_batch 相同，生成失败的数据不会合并
+    """
+    if instrumentation is None and context is not None:
+        instrumentation = context.instrumentation
+    check_result = template_cache.get(file_path, instrumentation)
+    if check_result['code'].is_error():
+        TemplateAnalyzer.print_check_info(check_result)
+        return None
+    template = check_result['data']['template']
+    options = (options or RenderOptions()).resolve()
+    if context is None:
+        context = options.make_context(instrumentation)
+    else:
+        context.instrumentation = instrumentation
+    if sink is None:
+        sink = FileSink()
+
+    merger, results = None, []
+    for index, datas in enumerate(data_loader):
+        if instrumentation is not None:
+            instrumentation.index = index
+            instrumentation.begin()
+        start = time.perf_counter()
+        try:
+            context.register_static_datas()
+            document, no_data_points = DocumentProcessor.render_document(template, datas, context)
+            if merger is None:
+                merger = DocumentMerger(document)
+            else:
+                merger.append(document, page_break)
+            result = {'code': RenderCode.SUCCESS, 'msg': 'successful', 'no_data_points': list(no_data_points)}
+        except Exception as e:
+            result = {'code': RenderCode.RENDER_ERROR, 'msg': f'{type(e).__name__}: {e}', 'no_data_points': []}
+        result.update({'index': index, 'save_path': save_path, 'time': time.perf_counter() - start,
+                       'save_time': 0.0, 'size': None})
+        results.append(result)
+        if instrumentation is not None:
+            instrumentation.end('document', code=result['code'].name)
+            instrumentation.index = None
+
+    size, save_time = 0, 0.0
+    if merger is not None:
+        save_start = time.perf_counter()
+        with optional_timer(instrumentation, 'save') as save_fields:
+            size = sink.write(save_path, lambda file: template.save(merger.document, file, options.copy_unchanged,
+                                                                    options.deterministic, options.compression))
+            save_fields['size'] = size
+        save_time = time.perf_counter() - save_start
+    return {'save_path': save_path, 'size': size, 'save_time': save_time, 'results': results}
@@ -1,32 +1,36 @@
 from helper.os_helper import *
+from batch_renderer import render_batch, print_batch_info
+from compiled_template import template_cache
 from data_loader import StaticDataLoader
-from template_analyzer import TemplateAnalyzer
+from template_analyzer import TemplateAnalyzer, RenderContext
 from doc_processor import DocumentProcessor
+from instrumentation import Instrumentation, optional_timer
 
 
-def match(file_path: str, save_path: str, datas: dict):
+def match(file_path: str, save_path: str, datas: dict, instrumentation: Instrumentation = None):
     # 更新模板分析器的标签信息
     # TemplateAnalyzer.update_labels_info()
 
-    # 注册每次模板生成过程的静态插入数据
-    TemplateAnalyzer.register_static_datas()
+    # 注册每次模板生成过程的静态插入数据，指定 instrumentation 时记录各阶段的耗时（与内存）
+    context = RenderContext(instrumentation=instrumentation)
+    context.register_static_datas()
 
-    # 模板检查与预处理
-    check_result = TemplateAnalyzer.check_template(file_path, DocumentProcessor.insert_data_to_no_content_point)
+    # 模板检查与编译，同一模板只编译一次
+    check_result = template_cache.get(file_path, instrumentation)
     TemplateAnalyzer.print_check_info(check_result, True)
     # 模板校验失败直接退出
     if check_result['code'].is_error():
         return
-    insert_points = check_result['data']['insert_points']
-    document = check_result['data']['document']
 
-    # 处理有内容类型插入点，检查并插入数据，返回没有对应数据的插入点
-    no_data_points = DocumentProcessor.solve_content_labels(insert_points, datas)
+    # 插入无内容标签信息，处理有内容类型插入点，检查并插入数据，返回没有对应数据的插入点
+    template = check_result['data']['template']
+    document, no_data_points = DocumentProcessor.render_document(template, datas, context)
     # 打印没有数据的插入点
     DocumentProcessor.print_no_data_points(no_data_points)
 
-    # 保存文件
-    document.save(save_path)
+    # 保存文件，未修改的部件直接拷贝模板中的压缩数据，save_path 也可以是可写的二进制文件对象（如 io.BytesIO）
+    with optional_timer(instrumentation, 'save') as save_fields:
+        save_fields['size'] = template.save(document, save_path)
 
 
 def main():
@@ -53,10 +57,11 @@ def main():
 
     tem_path = "data/template-demo.docx"
     to_dir = "test_data"
-    word_name = "word.docx"
+    word_name = "word_{index}.docx"
     make_sure_path(to_dir)
 
-    match(tem_path, f"{to_dir}/{word_name}", data_loader.load_data())
+    results = render_batch(tem_path, data_loader, f"{to_dir}/{word_name}")
+    print_batch_info(results, True)
 
 
 if __name__ == '__main__':
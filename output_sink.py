@@ -0,0 +1,167 @@
+import io
+import os
+import shutil
+import tarfile
+import time
+import zipfile
+from abc import ABCMeta, abstractmethod
+
+from helper.os_helper import replace_file
+
+
+class OutputSink(metaclass=ABCMeta):
+    """
+    生成结果输出目标，批量生成时每个文档以名称（由输出路径命名模式生成）写入输出目标
+
+    输出目标由调用方创建与关闭，可使用 with 语句
+    """
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def write(self, name: str, save) -> int:
+        """
+        写入一个文档
+
+        :param name: 文档名称
+        :param save: 保存函数，参数为可写的二进制文件对象或文件路径，将文档写入其中
+
+        :return: 写入的字节数
+        """
+        buf = io.BytesIO()
+        save(buf)
+        return self.write_bytes(name, buf.getvalue())
+
+    @abstractmethod
+    def write_bytes(self, name: str, data: bytes) -> int:
+        """写入已生成的文档内容，返回写入的字节数"""
+        pass
+
+    def write_file(self, name: str, src_path: str) -> int:
+        """写入已生成的文档文件（如生成结果缓存中的文件），返回写入的字节数"""
+        with open(src_path, 'rb') as f:
+            return self.write_bytes(name, f.read())
+
+    def close(self):
+        pass
+
+
+class FileSink(OutputSink):
+    """
+    每个文档写入一个文件，名称即为文件路径，默认的输出目标
+
+    总是先写入同目录下的临时文件再替换输出文件，不会留下写了一半的输出文件，
+    也不会截断原输出文件（它可能是生成结果缓存文件的硬链接，见 result_cache.ResultCache）
+    """
+
+    @staticmethod
+    def _replace(name: str, write) -> int:
+        replace_file(name, write)
+        return os.path.getsize(name)
+
+    def write(self, name: str, save) -> int:
+        return self._replace(name, save)
+
+    def write_bytes(self, name: str, data: bytes) -> int:
+        def write(tmp: str):
+            with open(tmp, 'wb') as f:
+                f.write(data)
+
+        return self._replace(name, write)
+
+    def write_file(self, name: str, src_path: str) -> int:
+        def link(tmp: str):
+            # 硬链接（跨文件系统时拷贝）到临时文件，临时文件已被创建，需先删除
+            os.remove(tmp)
+            try:
+                os.link(src_path, tmp)
+            except OSError:
+                shutil.copyfile(src_path, tmp)
+
+        return self._replace(name, link)
+
+
+class MemorySink(OutputSink):
+    """文档保存在内存中，用于嵌入其他程序，results 为文档名称到文档内容的字典"""
+
+    def __init__(self):
+        self.results = {}
+
+    def write_bytes(self, name: str, data: bytes) -> int:
+        self.results[name] = data
+        return len(data)
+
+
+class ZipBundleSink(OutputSink):
+    """
+    所有文档依次流式写入一个 zip 包，名称为包内路径
+
+    每个文档直接写入 zip 条目，不经过临时文件，内存占用与文档数量无关（只保留中央目录信息）。
+    file 可以是不可随机访问的流（如 sys.stdout.buffer），此时条目大小与 crc 写在数据之后
+    """
+
+    def __init__(self, file, compress_type: int = zipfile.ZIP_STORED, compress_level: int = None):
+        """
+        :param file: 输出 zip 文件路径或可写的二进制文件对象
+        :param compress_type: 包内条目的压缩方式，docx 本身已经压缩，默认不再压缩
+        :param compress_level: 压缩级别，见 zipfile.ZipFile
+        """
+        self._zf = zipfile.ZipFile(file, 'w', compress_type, allowZip64=True, compresslevel=compress_level)
+        self._fp = None if isinstance(file, str) else file
+
+    def _flush(self):
+        if self._fp is not None and hasattr(self._fp, 'flush'):
+            self._fp.flush()
+
+    def write(self, name: str, save) -> int:
+        info = zipfile.ZipInfo(name, time.localtime()[:6])
+        info.compress_type = self._zf.compression
+        # 文档大小未知，按 zip64 写入以支持超过 2GB 的条目
+        with self._zf.open(info, 'w', force_zip64=True) as f:
+            save(f)
+        self._flush()
+        return info.file_size
+
+    def write_bytes(self, name: str, data: bytes) -> int:
+        info = zipfile.ZipInfo(name, time.localtime()[:6])
+        info.compress_type = self._zf.compression
+        self._zf.writestr(info, data)
+        self._flush()
+        return len(data)
+
+    def close(self):
+        self._zf.close()
+        self._flush()
+
+
+class TarBundleSink(OutputSink):
+    """
+    所有文档依次流式写入一个 tar 包，名称为包内路径
+
+    tar 条目头部需要文件大小，每个文档先在内存中生成再写入，内存占用不超过单个文档的大小。
+    以流模式写入，file 可以是不可随机访问的流（如 sys.stdout.buffer）
+    """
+
+    def __init__(self, file, compression: str = ''):
+        """
+        :param file: 输出 tar 文件路径或可写的二进制文件对象
+        :param compression: 压缩方式，'' 不压缩，或 'gz'、'bz2'、'xz'
+        """
+        mode = f'w|{compression}'
+        if isinstance(file, str):
+            self._tf = tarfile.open(file, mode)
+        else:
+            self._tf = tarfile.open(fileobj=file, mode=mode)
+
+    def write_bytes(self, name: str, data: bytes) -> int:
+        info = tarfile.TarInfo(name)
+        info.size = len(data)
+        info.mtime = int(time.time())
+        self._tf.addfile(info, io.BytesIO(data))
+        return len(data)
+
+    def close(self):
+        self._tf.close()
@@ -0,0 +1,67 @@
+import hashlib
+import os
+
+from checkpoint import hash_datas
+from compiled_template import Compression
+from helper.os_helper import replace_file
+from labels import STATIC_IMAGE_DPI_KEY
+
+
+class ResultCache:
+    """
+    磁盘生成结果缓存，以 (模板哈希, 数据哈希, 静态数据哈希, 保存选项) 为键保存生成的文件，命中时直接硬链接（跨文件系统时拷贝）到输出路径，不再重新生成
+
+    只有确定性输出（见 CompiledTemplate.save 的 deterministic 参数）时相同键的生成结果才完全相同。
+    含有无法稳定计算哈希的值的数据（见 checkpoint.hash_datas）没有缓存键，不使用缓存。
+    插入内容引用的本地文件（如图片）按路径、修改时间与大小计入缓存键，不读取文件内容。
+    硬链接与缓存文件共用数据，不要原地修改输出文件；FileSink 总是写入新文件后替换，不会修改链接到缓存的文件
+    """
+
+    def __init__(self, cache_dir: str):
+        self.cache_dir = cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+
+    @staticmethod
+    def make_key(template, datas: dict, static_datas: dict, copy_unchanged: bool = True, deterministic: bool = False,
+                 compression: Compression = Compression.DEFAULT) -> [str, None]:
+        """
+        计算缓存键，数据无法稳定计算哈希时返回 None
+
+        :param template: 编译后的模板 CompiledTemplate
+        :param datas: 插入内容字典
+        :param static_datas: 渲染上下文的静态数据，只使用模板中出现的无内容标签的数据与图片目标分辨率
+        :param copy_unchanged: 保存选项，见 CompiledTemplate.save，保存选项不同的生成结果不共用缓存
+        :param deterministic: 保存选项，见 CompiledTemplate.save
+        :param compression: 保存选项，见 CompiledTemplate.save
+        """
+        used_static_datas = {t: static_datas.get(t) for t in template.no_content_types}
+        if static_datas.get(STATIC_IMAGE_DPI_KEY) is not None:
+            used_static_datas[STATIC_IMAGE_DPI_KEY] = static_datas[STATIC_IMAGE_DPI_KEY]
+        data_hash, static_data_hash = hash_datas(datas, template.get_data_files(datas)), hash_datas(used_static_datas)
+        if data_hash is None or static_data_hash is None:
+            return None
+        s = f'{template.template_hash}:{data_hash}:{static_data_hash}:{copy_unchanged}:{deterministic}:{compression.name}'
+        return hashlib.sha256(s.encode('utf-8')).hexdigest()
+
+    def _cache_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], key + '.docx')
+
+    def lookup(self, key: str) -> [str, None]:
+        """返回缓存文件路径，未命中时返回 None"""
+        cache_path = self._cache_path(key)
+        return cache_path if os.path.exists(cache_path) else None
+
+    def save(self, key: str, save) -> str:
+        """
+        生成文件并直接保存到缓存中
+
+        :param key: 缓存键
+        :param save: 保存函数，参数为文件路径
+
+        :return: 缓存文件路径
+        """
+        cache_path = self._cache_path(key)
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        # 多个线程同时保存相同的键时各自写入唯一的临时文件，互不覆盖
+        replace_file(cache_path, save)
+        return cache_path
@@ -2,8 +2,14 @@ import re
 from enum import Enum, unique
 
 from docx import Document
+from docx.opc.constants import RELATIONSHIP_TYPE
+from docx.oxml.ns import nsmap, qn
+from docx.text.paragraph import Paragraph
+from docx.text.run import Run
+from lxml import etree
 
 import labels
+from instrumentation import Instrumentation, optional_timer
 
 
 def is_no_content_point(p_d):
@@ -13,8 +19,65 @@ def is_no_content_point(p_d):
     return False
 
 
+class RenderContext:
+    """
+    渲染上下文，持有标签注册信息快照与静态数据
+
+    每个线程或每次批量生成使用独立的上下文，避免多线程同时生成时共用 TemplateAnalyzer 的类属性互相覆盖静态数据
+    """
+
+    def __init__(self, registered_labels: dict = None, clock: callable = None, instrumentation: Instrumentation = None,
+                 image_dpi: int = None):
+        """
+        :param registered_labels: 内容标签类型到标签的字典，默认使用 TemplateAnalyzer 当前注册信息的快照
+        :param clock: 时钟，无参数的可调用对象，返回注册静态数据时使用的时间戳（同 time.time），默认使用系统时间
+        :param instrumentation: 计时埋点，见 instrumentation.Instrumentation，默认不计时
+        :param image_dpi: 图片目标分辨率（每英寸像素数），超过显示尺寸所需像素的图片缩小并重新压缩后嵌入（需要安装 Pillow），默认嵌入原图
+        """
+        self.clock = clock
+        self.image_dpi = image_dpi
+        self.instrumentation = instrumentation
+        if registered_labels is None:
+            registered_labels = TemplateAnalyzer.registered_labels
+        self.registered_labels = dict(registered_labels)
+        self.insert_point_content_types = [label.get_type() for label in self.registered_labels.values() if label.has_content()]
+        self.insert_point_no_content_types = [label.get_type() for label in self.registered_labels.values() if not label.has_content()]
+        self.insert_point_types = self.insert_point_no_content_types + self.insert_point_content_types
+        self.static_datas = {}
+
+    def get_label(self, label_type: str):
+        """获取标签类型对应的标签，快照中不存在时查找并加入快照（如模板使用了按需加载的第三方标签），不存在时返回 None"""
+        label = self.registered_labels.get(label_type)
+        if label is None:
+            label = TemplateAnalyzer.get_label(label_type)
+            if label is not None:
+                self.registered_labels[label_type] = label
+                (self.insert_point_content_types if label.has_content() else self.insert_point_no_content_types).append(label_type)
+                self.insert_point_types.append(label_type)
+                label.register_static_datas(self.static_datas)
+        return label
+
+    def register_static_datas(self):
+        """标签依次向 static_datas 注册静态数据，每次注册会清空之前的数据"""
+        self.static_datas.clear()
+        if self.clock is not None:
+            self.static_datas[labels.STATIC_NOW_KEY] = self.clock()
+        if self.image_dpi is not None:
+            self.static_datas[labels.STATIC_IMAGE_DPI_KEY] = self.image_dpi
+        for label in self.registered_labels.values():
+            label.register_static_datas(self.static_datas)
+
+
 class TemplateAnalyzer:
     _content_label_re = re.compile(r'{{(.*?)}}')
+    _label_xpath_namespaces = {'w': nsmap['w'], 'mc': 'http://schemas.openxmlformats.org/markup-compatibility/2006'}
+    # 一次遍历找出文本中含有 '{{' 的 run，忽略兼容内容中的 mc:Fallback 分支（其内容与 mc:Choice 重复，如文本框）
+    _label_run_xpath = etree.XPath(".//w:t[contains(., '{{') and not(ancestor::mc:Fallback)]/parent::w:r",
+                                   namespaces=_label_xpath_namespaces)
+    # mc:Choice 中含有内容标签的兼容内容的 mc:Fallback 分支
+    _label_fallback_xpath = etree.XPath(".//mc:AlternateContent[mc:Choice//w:t[contains(., '{{')]]/mc:Fallback",
+                                        namespaces=_label_xpath_namespaces)
+    _story_part_reltypes = (RELATIONSHIP_TYPE.HEADER, RELATIONSHIP_TYPE.FOOTER)
 
     registered_labels = {label.get_type(): label for label in labels.LabelManager.get_labels()}
 
@@ -25,6 +88,9 @@ class TemplateAnalyzer:
 
     static_datas = {}
 
+    # 未指定渲染上下文时使用的计时埋点
+    instrumentation = None
+
     @classmethod
     def update_labels_info(cls):
         cls.registered_labels = {label.get_type(): label for label in labels.LabelManager.get_labels()}
@@ -32,6 +98,16 @@ class TemplateAnalyzer:
         cls.insert_point_no_content_types = [label.get_type() for label in cls.registered_labels.values() if not label.has_content()]
         cls.insert_point_types = cls.insert_point_no_content_types + cls.insert_point_content_types
 
+    @classmethod
+    def get_label(cls, label_type: str):
+        """获取标签类型对应的标签，未注册时通过 LabelManager.find_label 按需加载并更新注册信息，不存在时返回 None"""
+        label = cls.registered_labels.get(label_type)
+        if label is None:
+            label = labels.LabelManager.find_label(label_type)
+            if label is not None:
+                cls.update_labels_info()
+        return label
+
     @classmethod
     def register_static_datas(cls):
         """标签依次向 static_datas 注册静态数据，每次注册会清空之前的数据"""
@@ -53,24 +129,92 @@ class TemplateAnalyzer:
             return self.value < 0
 
     @classmethod
-    def check_template(cls, file_path: str, insert_operation: callable = is_no_content_point) -> dict:
+    def iter_story_parts(cls, document):
+        """
+        遍历可包含内容标签的文档部件：正文（含表格、文本框）、页眉与页脚
+
+        :return: 生成 (part, parent) 二元组，parent 为该部件中段落代理对象的父对象
+        """
+        yield document.part, document._body
+        for rel in document.part.rels.values():
+            if not rel.is_external and rel.reltype in cls._story_part_reltypes:
+                yield rel.target_part, rel.target_part
+
+    @classmethod
+    def find_label_runs(cls, part_element) -> list:
+        """
+        按文档顺序找出部件中文本含有 '{{' 的 run 元素，相同结构的部件（如克隆的部件）返回的列表一一对应
+
+        :param part_element: 部件的根元素
+        """
+        return cls._label_run_xpath(part_element)
+
+    @classmethod
+    def drop_label_fallbacks(cls, part_element):
+        """
+        删除 mc:Choice 中含有内容标签的兼容内容的 mc:Fallback 分支
+
+        内容标签只在 mc:Choice 中填充，保留 mc:Fallback 会让读取该分支的程序（如旧版本 Word）显示未填充的内容标签
+        """
+        for fallback in cls._label_fallback_xpath(part_element):
+            fallback.getparent().remove(fallback)
+
+    @classmethod
+    def scan_part(cls, part_element) -> list:
+        """
+        扫描部件的 XML 树，找出所有内容标签
+
+        :param part_element: 部件的根元素
+        :return: 按文档顺序排列的 (run 元素, [标签内容, ...]) 列表，标签内容为 '{{' 与 '}}' 之间的文本
+        """
+        scan_result = []
+        for r in cls.find_label_runs(part_element):
+            points = cls._content_label_re.findall(r.text)
+            if points:
+                scan_result.append((r, points))
+        return scan_result
+
+    @classmethod
+    def check_template(cls, file_path: str, insert_operation: callable = is_no_content_point,
+                       instrumentation: Instrumentation = None) -> dict:
         """
         校验出错返回错误信息，成功返回插入点信息字典与文件
 
-        :param file_path: 文件路径
+        扫描范围包括正文（含表格与文本框）、页眉与页脚，插入点信息中 part 为内容标签所在的文档部件。
+        含有内容标签的文本框等兼容内容会删除 mc:Fallback 分支，见 drop_label_fallbacks
+
+        :param file_path: 文件路径或文件对象
         :param insert_operation: 插入操作，是一个可调用对象（包括函数），参数为插入点信息字典，返回bool表示是否拦截该内容标签，若不拦截，保存到插入点信息字典
+        :param instrumentation: 计时埋点，记录 load 与 scan 阶段的耗时
 
         :return: (code, msg, data) 三元组。若 code = 1 {CheckCode.SUCCESS} 表示成功，data 为字典，包含 insert_points:插入点信息字典 与 document:文件对象；若 code < 0 表示失败，msg 为错误信息，data 为 None。
                  具体错误码说明：
                  -1 {CheckCode.NAME_REPEAT} [严重]: 内容标签名称重复。
                  -2 {CheckCode.LABEL_FORMAT_ERROR} [严重]: 内容标签格式错误。
         """
-        document = Document(file_path)
-        insert_points = {}
+        with optional_timer(instrumentation, 'load'):
+            document = Document(file_path)
+        with optional_timer(instrumentation, 'scan'):
+            return cls._check_document(document, insert_operation)
 
-        for paragraph in document.paragraphs:
-            for p_run_index, p_run in enumerate(paragraph.runs):
-                run_insert_points = cls._content_label_re.findall(p_run.text)
+    @classmethod
+    def _check_document(cls, document, insert_operation: callable) -> dict:
+        insert_points = {}
+        for part, parent in cls.iter_story_parts(document):
+            cls.drop_label_fallbacks(part.element)
+            paragraphs = {}
+            for r, run_insert_points in cls.scan_part(part.element):
+                p_element = r.getparent()
+                if p_element.tag == qn('w:p'):
+                    run_index = p_element.r_lst.index(r)
+                else:
+                    # run 位于超链接、修订等元素内
+                    p_element = next(r.iterancestors(qn('w:p')))
+                    run_index = None
+                paragraph = paragraphs.get(p_element)
+                if paragraph is None:
+                    paragraph = paragraphs[p_element] = Paragraph(p_element, parent)
+                p_run = Run(r, paragraph)
                 for point in run_insert_points:
                     # 内容标签格式检查
                     point_split = point.split(':')
@@ -79,12 +223,13 @@ class TemplateAnalyzer:
                                 "msg": f"内容标签'{point}'格式错误，应该为'{{label_type:label_name}}'，label_name 可省略，但不可省略 ':'",
                                 "data": None}
                     point_type, point_name = point_split
-                    # 忽略无法识别类型的内容标签
-                    if point_type not in cls.insert_point_types:
+                    # 忽略无法识别类型的内容标签，未注册的类型尝试按需加载第三方标签
+                    if point_type not in cls.insert_point_types and cls.get_label(point_type) is None:
                         continue
 
                     point_data = {'name': point_name, 'type': point_type, 'text': '{{' + point + '}}',
-                                  'run': p_run, 'run_index': p_run_index, 'paragraph': paragraph, 'document': document}
+                                  'run': p_run, 'run_index': run_index, 'paragraph': paragraph, 'document': document,
+                                  'part': part}
 
                     # 插入点信息处理
                     if not insert_operation(point_data):
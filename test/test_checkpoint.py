@@ -0,0 +1,71 @@
+import pytest
+from docx import Document
+
+from batch_renderer import RenderCode, RenderOptions, render_batch
+from checkpoint import hash_datas
+from compiled_template import Compression
+from data_loader import StaticDataLoader
+from labels import TableColumns
+
+
+def test_hash_datas_ndarray_content():
+    np = pytest.importorskip('numpy')
+    a = np.arange(5000.0)
+    b = a.copy()
+    b[1000] = -1
+    # str 相同（省略了中间元素）的不同数组哈希不同
+    assert str(a) == str(b)
+    assert hash_datas({'t': {'v': a}}) != hash_datas({'t': {'v': b}})
+    assert hash_datas({'t': {'v': a}}) == hash_datas({'t': {'v': a.copy()}})
+    assert hash_datas({'t': a}) != hash_datas({'t': a.astype('float32')})
+    assert hash_datas({'t': a.reshape(50, 100)}) != hash_datas({'t': a.reshape(100, 50)})
+
+
+def test_hash_datas_unstable_values():
+    assert hash_datas({'t': (row for row in [['a']])}) is None
+    assert hash_datas({'t': TableColumns({'a': [1, 2]})}) is None
+    assert hash_datas({'a': 1, 'b': [1, 2]}) == hash_datas({'b': [1, 2], 'a': 1})
+
+
+def test_checkpoint_skips_only_unchanged_records(tmp_path):
+    template_path = str(tmp_path / 'template.docx')
+    document = Document()
+    document.add_paragraph('{{table:t}}')
+    document.save(template_path)
+    save_pattern = str(tmp_path / 'out_{index}.docx')
+    checkpoint_path = str(tmp_path / 'checkpoint.jsonl')
+
+    def run(datas: list) -> list:
+        results = render_batch(template_path, StaticDataLoader(datas), save_pattern, checkpoint_path=checkpoint_path)
+        return [r['code'] for r in sorted(results, key=lambda r: r['index'])]
+
+    np = pytest.importorskip('numpy')
+    a = np.arange(5000.0)
+    b = a.copy()
+    b[1000] = -1
+    assert run([{'t': {'v': a}}, {'t': [['h'], ['1']]}]) == [RenderCode.SUCCESS, RenderCode.SUCCESS]
+    assert run([{'t': {'v': a}}, {'t': [['h'], ['1']]}]) == [RenderCode.SKIPPED, RenderCode.SKIPPED]
+    assert run([{'t': {'v': b}}, {'t': [['h'], ['1']]}]) == [RenderCode.SUCCESS, RenderCode.SKIPPED]
+    # 无法稳定计算哈希的数据每次都重新生成
+    for _ in range(2):
+        assert run([{'t': TableColumns({'v': b})}, {'t': [['h'], ['1']]}]) == [RenderCode.SUCCESS, RenderCode.SKIPPED]
+
+
+def test_checkpoint_rerenders_when_options_change(tmp_path):
+    template_path = str(tmp_path / 'template.docx')
+    document = Document()
+    document.add_paragraph('{{table:t}}')
+    document.save(template_path)
+    save_pattern = str(tmp_path / 'out_{index}.docx')
+    checkpoint_path = str(tmp_path / 'checkpoint.jsonl')
+
+    def run(options: RenderOptions) -> list:
+        results = render_batch(template_path, StaticDataLoader([{'t': [['h'], ['1']]}]), save_pattern,
+                               checkpoint_path=checkpoint_path, options=options)
+        return [r['code'] for r in results]
+
+    assert run(RenderOptions()) == [RenderCode.SUCCESS]
+    assert run(RenderOptions()) == [RenderCode.SKIPPED]
+    assert run(RenderOptions(image_dpi=50)) == [RenderCode.SUCCESS]
+    assert run(RenderOptions(image_dpi=50, compression=Compression.STORED)) == [RenderCode.SUCCESS]
+    assert run(RenderOptions(image_dpi=50, compression=Compression.STORED)) == [RenderCode.SKIPPED]
@@ -0,0 +1,115 @@
+import io
+
+from docx import Document
+from docx.oxml import parse_xml
+from docx.oxml.ns import qn
+
+from compiled_template import CompiledTemplate
+from doc_processor import DocumentProcessor
+from template_analyzer import RenderContext
+
+# 含内容标签的文本框，mc:Fallback 为旧版本 Word 使用的 VML 副本
+TEXT_BOX_RUN = (
+    '<w:r xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main"'
+    ' xmlns:mc="http://schemas.openxmlformats.org/markup-compatibility/2006"'
+    ' xmlns:wp="http://schemas.openxmlformats.org/drawingml/2006/wordprocessingDrawing"'
+    ' xmlns:a="http://schemas.openxmlformats.org/drawingml/2006/main"'
+    ' xmlns:wps="http://schemas.microsoft.com/office/word/2010/wordprocessingShape"'
+    ' xmlns:v="urn:schemas-microsoft-com:vml">'
+    '<mc:AlternateContent><mc:Choice Requires="wps"><w:drawing><wp:anchor>'
+    '<wp:extent cx="914400" cy="914400"/><wp:docPr id="100" name="text box"/>'
+    '<a:graphic><a:graphicData uri="http://schemas.microsoft.com/office/word/2010/wordprocessingShape">'
+    '<wps:wsp><wps:txbx><w:txbxContent><w:p><w:r><w:t>{text}</w:t></w:r></w:p></w:txbxContent></wps:txbx></wps:wsp>'
+    '</a:graphicData></a:graphic></wp:anchor></w:drawing></mc:Choice>'
+    '<mc:Fallback><w:pict><v:shape><v:textbox><w:txbxContent><w:p><w:r><w:t>{text}</w:t></w:r></w:p>'
+    '</w:txbxContent></v:textbox></v:shape></w:pict></mc:Fallback></mc:AlternateContent></w:r>')
+
+
+def render(template_path, datas: dict):
+    """编译模板并生成一份文档，返回重新打开的生成结果"""
+    check_result = CompiledTemplate.compile(str(template_path))
+    assert not check_result['code'].is_error(), check_result['msg']
+    template = check_result['data']['template']
+    context = RenderContext()
+    context.register_static_datas()
+    document, no_data_points = DocumentProcessor.render_document(template, datas, context)
+    assert no_data_points == {}
+    buf = io.BytesIO()
+    template.save(document, buf)
+    buf.seek(0)
+    return Document(buf)
+
+
+def all_texts(document) -> list:
+    return [''.join(t.text for t in p.iter(qn('w:t'))) for p in document.element.body.iter(qn('w:p'))]
+
+
+def test_text_box_label(tmp_path):
+    template_path = tmp_path / 'text_box.docx'
+    document = Document()
+    document.add_paragraph('{{text:title}}')
+    document.add_paragraph()._p.append(parse_xml(TEXT_BOX_RUN.format(text='文本框：{{text:box}}')))
+    document.save(template_path)
+
+    texts = all_texts(render(template_path, {'title': '标题', 'box': '文本框内容'}))
+    assert '标题' in texts
+    assert '文本框：文本框内容' in texts
+    # mc:Fallback 分支中不能残留未填充的内容标签
+    assert not any('{{' in text for text in texts)
+
+
+def test_table_cell_labels_keep_cell_ending_paragraph(tmp_path):
+    template_path = tmp_path / 'table_cell.docx'
+    document = Document()
+    table = document.add_table(rows=1, cols=3)
+    table.cell(0, 0).paragraphs[0].text = '{{table:table}}'
+    table.cell(0, 1).paragraphs[0].text = '{{unordered-list:items}}'
+    table.cell(0, 2).paragraphs[0].text = '{{text:text}}'
+    document.save(template_path)
+
+    result = render(template_path, {'table': [['h1', 'h2'], ['1', '2']], 'items': [], 'text': '文本'})
+    cells = result.tables[0]._tbl.tr_lst[0].tc_lst
+    assert len(cells) == 3
+    # 单元格必须以段落结尾
+    for tc in cells:
+        assert tc[-1].tag == qn('w:p')
+    assert cells[0].find(qn('w:tbl')) is not None
+    assert '文本' in all_texts(result)
+
+
+def test_rendered_document_is_editable(tmp_path):
+    template_path = tmp_path / 'editable.docx'
+    document = Document()
+    document.add_paragraph('{{text:title}}')
+    document.add_table(rows=1, cols=1)
+    document.save(template_path)
+
+    check_result = CompiledTemplate.compile(str(template_path))
+    template = check_result['data']['template']
+    context = RenderContext()
+    context.register_static_datas()
+    rendered, _ = DocumentProcessor.render_document(template, {'title': '标题'}, context)
+    # python-docx 代理对象须指向克隆文档的 XML 树
+    assert rendered.paragraphs[0].text == '标题'
+    assert len(rendered.tables) == 1
+    rendered.add_paragraph('追加段落')
+    buf = io.BytesIO()
+    template.save(rendered, buf)
+    buf.seek(0)
+    assert '追加段落' in all_texts(Document(buf))
+
+
+def test_list_label_inside_insertion(tmp_path):
+    template_path = tmp_path / 'insertion.docx'
+    document = Document()
+    # 内容标签位于修订（w:ins）中，段落没有直接子元素 run
+    document.add_paragraph()._p.append(parse_xml(
+        '<w:ins xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main" w:id="1" w:author="a">'
+        '<w:r><w:rPr><w:b/></w:rPr><w:t>{{unordered-list:u}}</w:t></w:r></w:ins>'))
+    document.save(template_path)
+
+    result = render(template_path, {'u': ['项目1', '项目2']})
+    texts = all_texts(result)
+    assert [t for t in texts if '项目' in t] == ['● 项目1', '● 项目2']
+    # 新段落拷贝标签 run 的样式
+    assert all(p.runs[0].bold for p in result.paragraphs if '项目' in p.text)
@@ -0,0 +1,24 @@
+import json
+
+import pytest
+
+from data_loader import JsonLinesDataLoader
+
+
+@pytest.mark.parametrize('shard_count', [1, 2, 3, 5, 7, 64])
+def test_json_lines_shards_cover_every_line_once(tmp_path, shard_count):
+    records = [{'i': i, 'text': '数据' * (i % 4)} for i in range(20)]
+    lines = [json.dumps(r, ensure_ascii=False) for r in records]
+    # 空行与多个连续空行，最后一行没有换行符
+    lines[3:3] = ['']
+    lines[10:10] = ['', '  ']
+    data_path = str(tmp_path / 'datas.jsonl')
+    with open(data_path, 'w', encoding='utf-8') as f:
+        f.write('\n'.join(lines))
+
+    loaded = []
+    for shard_index in range(shard_count):
+        with JsonLinesDataLoader(data_path, chunk_size=3, shard_index=shard_index, shard_count=shard_count) as loader:
+            loaded.extend(record['i'] for record in loader)
+    assert sorted(loaded) == list(range(20))
+    assert len(loaded) == len(set(loaded))
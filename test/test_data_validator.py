@@ -0,0 +1,27 @@
+import json
+
+from docx import Document
+
+from batch_renderer import RenderCode, render_batch
+from compiled_template import CompiledTemplate
+from data_loader import JsonLinesDataLoader
+from data_validator import DataValidator
+
+
+def test_validate_then_render_same_data_file(tmp_path):
+    template_path = str(tmp_path / 'template.docx')
+    document = Document()
+    document.add_paragraph('{{text:title}}')
+    document.save(template_path)
+    data_path = str(tmp_path / 'datas.jsonl')
+    with open(data_path, 'w', encoding='utf-8') as f:
+        for datas in ({'title': '标题'}, {'title': 1}):
+            f.write(json.dumps(datas) + '\n')
+
+    validator = DataValidator(CompiledTemplate.compile(template_path)['data']['template'].get_schema())
+    expected = [{'index': 1, 'errors': ["内容标签'title'类型 text 不能匹配数据 <class 'int'>"]}]
+    assert validator.validate(data_path) == expected
+    assert validator.validate(lambda: JsonLinesDataLoader(data_path)) == expected
+
+    results = render_batch(template_path, JsonLinesDataLoader(data_path), str(tmp_path / 'out_{index}.docx'))
+    assert [r['code'] for r in results] == [RenderCode.SUCCESS, RenderCode.SUCCESS]
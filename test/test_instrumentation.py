@@ -0,0 +1,38 @@
+import threading
+import time
+
+from instrumentation import BufferSink, Instrumentation
+
+
+def test_shared_instrumentation_across_threads():
+    sink = BufferSink()
+    instrumentation = Instrumentation(sink)
+    barrier = threading.Barrier(4)
+
+    def worker(index: int):
+        for _ in range(20):
+            instrumentation.index = index
+            instrumentation.begin()
+            barrier.wait()
+            # 序号越大阶段越长，阶段交错开始与结束
+            time.sleep(0.001 * index)
+            with instrumentation.timer('label', label_type=f'type{index}'):
+                pass
+            instrumentation.end('document', worker=index)
+            instrumentation.index = None
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    documents = [e for e in sink.events if e['stage'] == 'document']
+    labels = [e for e in sink.events if e['stage'] == 'label']
+    assert len(documents) == len(labels) == 80
+    for event in documents:
+        assert event['index'] == event['worker']
+        assert event['duration'] >= 0.001 * event['worker']
+    for event in labels:
+        assert event['label_type'] == f"type{event['index']}"
+    assert instrumentation.index is None
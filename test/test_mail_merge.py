@@ -0,0 +1,68 @@
+import os
+import zipfile
+
+from docx import Document
+from docx.oxml import parse_xml
+from docx.oxml.ns import nsmap, qn
+
+from batch_renderer import RenderCode
+from data_loader import StaticDataLoader
+from mail_merge import merge_batch
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SAMPLE_IMAGE = os.path.join(PROJECT_DIR, 'data', 'p1.jpg')
+
+
+def test_merge_remaps_relationships_and_dedups_images(tmp_path):
+    template_path = str(tmp_path / 'template.docx')
+    document = Document()
+    document.add_paragraph('{{text:t}}')
+    document.add_paragraph('{{image:shared}}')
+    document.add_paragraph('{{image:own}}')
+    document.add_paragraph('{{link:same}}')
+    document.add_paragraph('{{link:own_link}}')
+    document.save(template_path)
+
+    with open(SAMPLE_IMAGE, 'rb') as f:
+        sample = f.read()
+    datas = []
+    for i in range(3):
+        # JPEG 结束标记后追加不同的字节，得到内容不同的有效图片
+        own_image = str(tmp_path / f'own{i}.jpg')
+        with open(own_image, 'wb') as f:
+            f.write(sample + bytes([i + 1]))
+        datas.append({'t': f'记录{i}', 'shared': ('共用图片', SAMPLE_IMAGE), 'own': (None, own_image),
+                      'same': ('相同链接', 'https://example.com/same'), 'own_link': ('链接', f'https://example.com/{i}')})
+
+    save_path = str(tmp_path / 'merged.docx')
+    result = merge_batch(template_path, StaticDataLoader(datas), save_path)
+    assert [r['code'] for r in result['results']] == [RenderCode.SUCCESS] * 3
+
+    with zipfile.ZipFile(save_path) as zf:
+        assert zf.testzip() is None
+        body = parse_xml(zf.read('word/document.xml'))[0]
+        rels = {rel.get('Id'): rel for rel in parse_xml(zf.read('word/_rels/document.xml.rels'))}
+        media = [zf.read(name) for name in zf.namelist() if name.startswith('word/media/')]
+
+    # 所有 r:id、r:embed 等关系引用都能在关系部件中找到
+    r_prefix = '{%s}' % nsmap['r']
+    r_ids = {value for el in body.iter() for name, value in el.attrib.items() if name.startswith(r_prefix)}
+    assert r_ids and r_ids <= rels.keys()
+
+    # 共用图片只保存一份，每条记录各自的图片各一份
+    assert len(media) == len(set(media)) == 4
+    assert sample in media
+
+    # 相同的链接只有一个关系，不同的链接各有一个
+    targets = [rel.get('Target') for rel in rels.values() if rel.get('TargetMode') == 'External']
+    assert sorted(targets) == sorted(['https://example.com/same'] + [f'https://example.com/{i}' for i in range(3)])
+
+    doc_pr_ids = [el.get('id') for el in body.iter(qn('wp:docPr'))]
+    assert len(doc_pr_ids) == 6
+    assert len(set(doc_pr_ids)) == len(doc_pr_ids)
+
+    # 只保留第一份文档的节属性，且位于正文末尾
+    assert [child.tag for child in body].count(qn('w:sectPr')) == 1
+    assert body[-1].tag == qn('w:sectPr')
+    texts = [p.text for p in Document(save_path).paragraphs]
+    assert [t for t in texts if t.startswith('记录')] == ['记录0', '记录1', '记录2']
@@ -0,0 +1,147 @@
+import os
+import shutil
+import threading
+import zipfile
+
+import pytest
+from docx import Document
+
+from batch_renderer import RenderCode, RenderOptions, render_batch
+from compiled_template import Compression
+from data_loader import StaticDataLoader
+from labels import TableColumns
+from result_cache import ResultCache
+
+
+def make_template(tmp_path) -> str:
+    template_path = str(tmp_path / 'template.docx')
+    document = Document()
+    document.add_paragraph('{{table:t}}')
+    document.save(template_path)
+    return template_path
+
+
+def cache_files(cache_dir) -> list:
+    return [name for _, _, names in os.walk(cache_dir) for name in names]
+
+
+def test_changed_array_is_not_served_from_cache(tmp_path):
+    np = pytest.importorskip('numpy')
+    template_path = make_template(tmp_path)
+    options = RenderOptions(deterministic=True, now=1e9, result_cache_dir=str(tmp_path / 'cache'))
+    save_path = str(tmp_path / 'out.docx')
+    a = np.arange(5000.0)
+    b = a.copy()
+    b[1000] = -1
+
+    def run(datas: dict):
+        result = render_batch(template_path, StaticDataLoader([datas]), save_path, options=options)[0]
+        return result['code'], Document(save_path).tables[0].cell(1001, 0).text
+
+    assert run({'t': {'v': a}}) == (RenderCode.SUCCESS, '1000.0')
+    assert run({'t': {'v': a.copy()}}) == (RenderCode.CACHED, '1000.0')
+    assert run({'t': {'v': b}}) == (RenderCode.SUCCESS, '-1.0')
+
+
+def test_save_options_are_part_of_key(tmp_path):
+    template_path = make_template(tmp_path)
+    save_path = str(tmp_path / 'out.docx')
+    datas = {'t': [['h'], ['1']]}
+    for compression, code in ((Compression.STORED, RenderCode.SUCCESS), (Compression.DEFAULT, RenderCode.SUCCESS),
+                              (Compression.STORED, RenderCode.CACHED)):
+        options = RenderOptions(deterministic=True, now=1e9, result_cache_dir=str(tmp_path / 'cache'),
+                                compression=compression)
+        result = render_batch(template_path, StaticDataLoader([datas]), save_path, options=options)[0]
+        assert result['code'] == code
+        with zipfile.ZipFile(save_path) as zf:
+            assert zf.getinfo('word/document.xml').compress_type == compression.value[0]
+
+
+def test_unhashable_datas_are_not_cached(tmp_path):
+    template_path = make_template(tmp_path)
+    cache_dir = tmp_path / 'cache'
+    options = RenderOptions(deterministic=True, now=1e9, result_cache_dir=str(cache_dir))
+    for _ in range(2):
+        results = render_batch(template_path, StaticDataLoader([{'t': TableColumns({'v': [1, 2]})}]),
+                               str(tmp_path / 'out.docx'), options=options)
+        assert results[0]['code'] == RenderCode.SUCCESS
+    assert cache_files(cache_dir) == []
+
+
+def test_concurrent_save_same_key(tmp_path):
+    cache = ResultCache(str(tmp_path / 'cache'))
+    barrier = threading.Barrier(4)
+    errors = []
+
+    def save(path):
+        barrier.wait()
+        with open(path, 'wb') as f:
+            f.write(b'x' * 100000)
+
+    def worker():
+        try:
+            cache.save('ab' + '0' * 62, save)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert errors == []
+    assert cache_files(tmp_path / 'cache') == ['ab' + '0' * 62 + '.docx']
+
+
+def test_uncached_render_does_not_overwrite_linked_cache_file(tmp_path):
+    template_path = make_template(tmp_path)
+    cache_dir = str(tmp_path / 'cache')
+    options = RenderOptions(deterministic=True, now=1e9, result_cache_dir=cache_dir)
+    save_path = str(tmp_path / 'out.docx')
+
+    def run(datas: dict, path: str):
+        result = render_batch(template_path, StaticDataLoader([datas]), path, options=options)[0]
+        return result['code'], Document(path).tables[0].cell(1, 0).text
+
+    assert run({'t': [['h'], ['ORIGINAL']]}, save_path) == (RenderCode.SUCCESS, 'ORIGINAL')
+    # 无法计算哈希的数据不使用缓存，写入与缓存文件硬链接的同一输出路径
+    assert run({'t': TableColumns({'h': ['OTHER']})}, save_path) == (RenderCode.SUCCESS, 'OTHER')
+    assert run({'t': [['h'], ['ORIGINAL']]}, str(tmp_path / 'out2.docx')) == (RenderCode.CACHED, 'ORIGINAL')
+
+
+def test_replaced_image_is_not_served_from_cache(tmp_path):
+    template_path = str(tmp_path / 'image.docx')
+    document = Document()
+    document.add_paragraph('{{image:i}}')
+    document.save(template_path)
+    options = RenderOptions(deterministic=True, now=1e9, result_cache_dir=str(tmp_path / 'cache'))
+    image_path = str(tmp_path / 'image.jpg')
+    sample = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'p1.jpg')
+
+    def run():
+        result = render_batch(template_path, StaticDataLoader([{'i': [None, image_path]}]), str(tmp_path / 'out.docx'),
+                              options=options)[0]
+        return result['code']
+
+    shutil.copyfile(sample, image_path)
+    assert run() == RenderCode.SUCCESS
+    assert run() == RenderCode.CACHED
+    with open(image_path, 'ab') as f:
+        f.write(b'\0')
+    assert run() == RenderCode.SUCCESS
+
+
+def test_outputs_and_cache_files_use_umask_permissions(tmp_path):
+    template_path = make_template(tmp_path)
+    cache_dir = tmp_path / 'cache'
+    options = RenderOptions(deterministic=True, now=1e9, result_cache_dir=str(cache_dir))
+    umask = os.umask(0)
+    os.umask(umask)
+    expected = 0o666 & ~umask
+    for path in (str(tmp_path / 'cached.docx'), str(tmp_path / 'uncached.docx')):
+        render_batch(template_path, StaticDataLoader([{'t': [['h'], ['1']]}]), path, options=options)
+        assert os.stat(path).st_mode & 0o777 == expected
+        options = RenderOptions(deterministic=True, now=1e9)
+    for root, _, names in os.walk(cache_dir):
+        for name in names:
+            assert os.stat(os.path.join(root, name)).st_mode & 0o777 == expected
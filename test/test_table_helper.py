@@ -0,0 +1,10 @@
+import pytest
+
+from helper.table_helper import format_column
+
+
+def test_format_datetime64_column_with_nat():
+    np = pytest.importorskip('numpy')
+    values = np.array(['2024-01-02', 'NaT'], dtype='datetime64[D]')
+    assert format_column(values, '%Y-%m-%d') == ['2024-01-02', 'NaT']
+    assert format_column(values, '%d/%m/%Y') == ['02/01/2024', 'NaT']
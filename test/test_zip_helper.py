@@ -0,0 +1,151 @@
+import io
+import os
+import zipfile
+
+import pytest
+from docx import Document
+
+from compiled_template import CompiledTemplate, Compression
+from doc_processor import DocumentProcessor
+from helper.zip_helper import RawZipWriter, read_raw_entry
+from template_analyzer import RenderContext, TemplateAnalyzer
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEMO_TEMPLATE = os.path.join(PROJECT_DIR, 'data', 'template-demo.docx')
+DEMO_DATAS = {
+    'file_title0': '插入文档的标题',
+    'file_content0': '插入文档的内容，' * 20,
+    'file_content1': '文字的样式保持一致',
+    'file_ul1': ['无序列表内容1', '无序列表内容2', '无序列表内容3'],
+    'file_ol1': ['有序列表内容1', '有序列表内容2', '有序列表内容3'],
+    'file_link1': ('百度的链接', 'https://www.baidu.com'),
+    'file_img1': ('这是图片的介绍', os.path.join(PROJECT_DIR, 'data', 'p1.jpg')),
+    'file_table1': [['姓名', '学号'], ['张三', '123456789'], ['李四', '987654321']],
+}
+
+
+class _Unseekable:
+    """不可定位的输出流，zipfile 写入时使用 data descriptor（标志位 bit 3）"""
+
+    def __init__(self):
+        self.buf = io.BytesIO()
+
+    def write(self, b):
+        return self.buf.write(b)
+
+    def flush(self):
+        pass
+
+
+def read_entries(data: bytes) -> dict:
+    with zipfile.ZipFile(io.BytesIO(data)) as zf:
+        assert zf.testzip() is None
+        return {name: zf.read(name) for name in zf.namelist()}
+
+
+def test_write_raw_copies_entries():
+    source = _Unseekable()
+    with zipfile.ZipFile(source, 'w', zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr('a.xml', b'<a/>' * 100)
+        zf.writestr('中文/名称.txt', '内容'.encode('utf-8'))
+        zf.writestr(zipfile.ZipInfo('stored.bin'), bytes(range(256)), zipfile.ZIP_STORED)
+    source_bytes = source.buf.getvalue()
+
+    out = io.BytesIO()
+    with RawZipWriter(out) as writer:
+        with zipfile.ZipFile(io.BytesIO(source_bytes)) as zf:
+            infos = zf.infolist()
+            assert all(info.flag_bits & 0x08 for info in infos)
+            for info in infos:
+                writer.write_raw(info, read_raw_entry(source_bytes, info))
+        writer.writestr('new.xml', b'<new/>', zipfile.ZIP_STORED)
+        writer.writestr('new2.xml', b'<new2/>' * 10, zipfile.ZIP_DEFLATED, 1, (1980, 1, 1, 0, 0, 0))
+    assert writer.size == len(out.getvalue())
+
+    entries = read_entries(out.getvalue())
+    assert entries == {'a.xml': b'<a/>' * 100, '中文/名称.txt': '内容'.encode('utf-8'), 'stored.bin': bytes(range(256)),
+                       'new.xml': b'<new/>', 'new2.xml': b'<new2/>' * 10}
+
+
+@pytest.fixture(scope='module')
+def demo_document():
+    check_result = CompiledTemplate.compile(DEMO_TEMPLATE)
+    assert not check_result['code'].is_error(), check_result['msg']
+    template = check_result['data']['template']
+    context = RenderContext(clock=lambda: 1e9)
+    context.register_static_datas()
+    document, no_data_points = DocumentProcessor.render_document(template, DEMO_DATAS, context)
+    assert no_data_points == {}
+    return template, document
+
+
+@pytest.mark.parametrize('compression', list(Compression))
+@pytest.mark.parametrize('copy_unchanged', [True, False])
+def test_save_round_trip(demo_document, compression, copy_unchanged):
+    template, document = demo_document
+    out = io.BytesIO()
+    size = template.save(document, out, copy_unchanged=copy_unchanged, compression=compression)
+    assert size == len(out.getvalue())
+    entries = read_entries(out.getvalue())
+
+    full = io.BytesIO()
+    document.save(full)
+    expected = read_entries(full.getvalue())
+    with open(DEMO_TEMPLATE, 'rb') as f:
+        template_bytes = f.read()
+    template_entries = read_entries(template_bytes)
+    changed = {'[Content_Types].xml', '_rels/.rels'}
+    for part, _ in TemplateAnalyzer.iter_story_parts(document):
+        changed.update((part.partname.membername, part.partname.rels_uri.membername))
+
+    # 部件与 document.save 相同，原样拷贝的部件与模板相同
+    assert entries.keys() == expected.keys()
+    for name, blob in expected.items():
+        if copy_unchanged and name in template_entries and name not in changed:
+            blob = template_entries[name]
+        assert entries[name] == blob, name
+
+    # 原样拷贝的部件保持模板的压缩方式
+    with zipfile.ZipFile(io.BytesIO(template_bytes)) as tz, zipfile.ZipFile(io.BytesIO(out.getvalue())) as oz:
+        styles = oz.getinfo('word/styles.xml')
+        expected_type = tz.getinfo('word/styles.xml').compress_type if copy_unchanged else compression.value[0]
+        assert styles.compress_type == expected_type
+        assert oz.getinfo('word/document.xml').compress_type == compression.value[0]
+
+    out.seek(0)
+    texts = [p.text for p in Document(out).paragraphs]
+    assert '插入文档的标题' in texts
+
+
+def test_save_deterministic(demo_document):
+    template, document = demo_document
+    outputs = []
+    for _ in range(2):
+        out = io.BytesIO()
+        template.save(document, out, deterministic=True)
+        outputs.append(out.getvalue())
+    assert outputs[0] == outputs[1]
+    read_entries(outputs[0])
+
+
+def test_orphan_template_entry_is_not_copied(tmp_path):
+    template_path = str(tmp_path / 'orphan.docx')
+    document = Document()
+    document.add_paragraph('{{image:i}}')
+    document.save(template_path)
+    # 模板中未被任何关系引用的条目，与插入图片时新建的部件同名
+    with zipfile.ZipFile(template_path, 'a') as zf:
+        zf.writestr('word/media/image1.jpg', b'orphan')
+
+    check_result = CompiledTemplate.compile(template_path)
+    template = check_result['data']['template']
+    context = RenderContext()
+    context.register_static_datas()
+    image_path = os.path.join(PROJECT_DIR, 'data', 'p1.jpg')
+    document, _ = DocumentProcessor.render_document(template, {'i': (None, image_path)}, context)
+    out = io.BytesIO()
+    template.save(document, out)
+
+    with open(image_path, 'rb') as f:
+        image_blob = f.read()
+    assert image_blob in read_entries(out.getvalue()).values()